@@ -0,0 +1,90 @@
+"""
+Benchmark for FinancialDataExtractor.export_to_excel.
+
+Compares the previous in-memory pandas/openpyxl writer with the streaming
+write-only exporter on synthetic rows. Each mode runs in its own process so
+the reported peak RSS belongs to that mode alone.
+
+Usage:
+    python benchmarks/bench_export.py --rows 1000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source_script"))
+
+MODES = ("pandas", "streaming")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build_extractor(rows):
+    """Creates an extractor holding `rows` synthetic company-year rows (5 years per company)."""
+    from Financial_extract_2 import FinancialDataExtractor, CompanyRowStore
+
+    extractor = FinancialDataExtractor(checkpoint_path=None, cache=False)
+    extractor.data = CompanyRowStore(
+        {
+            "timevalue": str(2024 - i % 5),
+            "companyname": f"Company {i // 5:07d}",
+            "industryclassification": f"Industry {i % 97}",
+            "geonameen": f"Country {i % 41}",
+            "revenue": 1_000_000 + i * 7,
+            "revenue_unit": "USD"
+        }
+        for i in range(rows)
+    )
+    return extractor
+
+
+def export_with_pandas(extractor, filename):
+    """The exporter as it was before streaming: full workbook in memory."""
+    import pandas as pd
+
+    df = extractor._prepare_export_frame()
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False)
+        writer.sheets['Sheet1'].freeze_panes = 'A2'
+
+
+def run_mode(mode, rows):
+    extractor = build_extractor(rows)
+    baseline = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "export.xlsx")
+        start = time.perf_counter()
+        if mode == "pandas":
+            export_with_pandas(extractor, filename)
+        else:
+            extractor.export_to_excel(filename)
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(filename) / (1024 * 1024)
+    print(f"{mode:<10} rows={rows:<9} time={elapsed:8.2f}s  "
+          f"peak_rss={peak_rss_mb():8.1f}MB  (before export {baseline:.1f}MB)  file={size_mb:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Excel exporters.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--mode", choices=MODES + ("all",), default="all")
+    args = parser.parse_args()
+
+    if args.mode != "all":
+        run_mode(args.mode, args.rows)
+        return
+    for mode in MODES:
+        subprocess.run([sys.executable, os.path.abspath(__file__),
+                        "--rows", str(args.rows), "--mode", mode], check=True)
+
+
+if __name__ == "__main__":
+    main()
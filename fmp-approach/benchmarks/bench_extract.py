@@ -0,0 +1,134 @@
+"""
+End-to-end throughput benchmark for FinancialDataExtractor, with no API quota used.
+
+Starts the mock FMP server, points the extractor at it and runs
+extract_all_companies (or the async variant) over a synthetic universe.
+Reports symbols/sec, request latency percentiles, requests made and peak RSS.
+Results can be saved and compared against an earlier run:
+
+    python benchmarks/bench_extract.py --symbols 200 --concurrency 8 --save base.json
+    python benchmarks/bench_extract.py --symbols 200 --concurrency 8 --baseline base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "source_script"))
+sys.path.insert(0, HERE)
+
+import Financial_extract_2 as fe  # noqa: E402
+from mock_fmp_server import MockSettings, start_server  # noqa: E402
+
+
+class TimedTransport(fe.FMPTransport):
+    """FMPTransport that records the latency of every request."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.latencies = []
+
+    def get(self, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().get(url, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run(args):
+    universe = [f"SYM{i:05d}" for i in range(args.symbols)]
+    settings = MockSettings(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                            extra_fields=args.extra_fields)
+    server, base_url = start_server(settings, universe)
+
+    fe.BASE_URL = base_url
+    fe.MAX_COMPANIES = args.symbols
+    fe.RETRY_MIN_WAIT = fe.RETRY_MAX_WAIT = args.retry_wait
+    # A few unknown tickers, like the delisted ones in company_symbols.txt
+    symbols = universe + [f"GONE{i}" for i in range(args.unknown)]
+
+    transport = TimedTransport(pool_maxsize=max(args.concurrency, 10))
+    extractor = fe.FinancialDataExtractor(
+        rate_limiter=fe.RateLimiter(per_second=args.rate_per_second, per_minute=0),
+        transport=transport, cache=False, checkpoint_path=None)
+    start = time.perf_counter()
+    try:
+        if args.concurrency > 1:
+            asyncio.run(extractor.extract_all_companies_async(symbols, args.concurrency))
+        else:
+            extractor.extract_all_companies(symbols)
+    finally:
+        elapsed = time.perf_counter() - start
+        extractor.close()
+        server.shutdown()
+
+    latencies = transport.latencies
+    return {
+        "symbols": len(symbols),
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "symbols_per_s": round(len(extractor.processed_symbols) / elapsed, 2) if elapsed else 0.0,
+        "processed": len(extractor.processed_symbols),
+        "failed": len(extractor.failed_symbols),
+        "requests": extractor.request_count,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction against a mock FMP API.")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--unknown", type=int, default=0, help="extra tickers the mock doesn't know")
+    parser.add_argument("--concurrency", type=int, default=fe.CONCURRENCY)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--jitter-ms", type=float, default=30.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of 429 responses")
+    parser.add_argument("--extra-fields", type=int, default=35, help="padding line items per statement")
+    parser.add_argument("--rate-per-second", type=float, default=0,
+                        help="client rate limit (0 = unlimited)")
+    parser.add_argument("--retry-wait", type=float, default=0.5, help="seconds between retry passes")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    args = parser.parse_args()
+
+    fe.logger.setLevel("WARNING")
+    results = run(args)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    for key, value in results.items():
+        line = f"{key:<16} {value}"
+        if isinstance(baseline.get(key), (int, float)) and baseline[key]:
+            line += f"   (baseline {baseline[key]}, {(value - baseline[key]) / baseline[key]:+.1%})"
+        print(line)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
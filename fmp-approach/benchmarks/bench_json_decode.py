@@ -0,0 +1,108 @@
+"""
+Micro-benchmark for decoding FMP income-statement responses.
+
+Compares the stdlib decoder on the full payload (what response.json() did)
+with decode_json, which uses orjson when installed and keeps only the
+statement fields the extractor reads. Reports time and peak allocation per
+payload.
+
+Usage:
+    python benchmarks/bench_json_decode.py                      # synthetic payloads
+    python benchmarks/bench_json_decode.py --payloads recorded/ # directory of saved *.json responses
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source_script"))
+
+from Financial_extract_2 import STATEMENT_FIELDS, YEARS, decode_json, orjson  # noqa: E402
+
+# Line items of an FMP annual income statement besides the ones we read
+LINE_ITEMS = (
+    "cik", "fillingDate", "acceptedDate", "calendarYear", "period", "costOfRevenue",
+    "grossProfit", "grossProfitRatio", "researchAndDevelopmentExpenses",
+    "generalAndAdministrativeExpenses", "sellingAndMarketingExpenses",
+    "sellingGeneralAndAdministrativeExpenses", "otherExpenses", "operatingExpenses",
+    "costAndExpenses", "interestIncome", "interestExpense", "depreciationAndAmortization",
+    "ebitda", "ebitdaratio", "operatingIncome", "operatingIncomeRatio",
+    "totalOtherIncomeExpensesNet", "incomeBeforeTax", "incomeBeforeTaxRatio",
+    "incomeTaxExpense", "netIncome", "netIncomeRatio", "eps", "epsdiluted",
+    "weightedAverageShsOut", "weightedAverageShsOutDil", "link", "finalLink"
+)
+
+
+def synthetic_payloads(count):
+    """Builds `count` income-statement responses shaped like FMP's, YEARS statements each."""
+    rng = random.Random(42)
+    payloads = []
+    for i in range(count):
+        statements = []
+        for year in range(2024, 2024 - YEARS, -1):
+            statement = {
+                "date": f"{year}-09-30",
+                "symbol": f"SYM{i}",
+                "reportedCurrency": "USD",
+                "fiscalYear": str(year),
+                "revenue": rng.randint(10 ** 6, 10 ** 12)
+            }
+            for item in LINE_ITEMS:
+                statement[item] = rng.random() * 10 ** 9 if item[0] != "l" else "https://example.com/x"
+            statements.append(statement)
+        payloads.append(json.dumps(statements).encode())
+    return payloads
+
+
+def recorded_payloads(directory):
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, "rb") as f:
+            payloads.append(f.read())
+    return payloads
+
+
+def measure(label, decode, payloads, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for payload in payloads:
+            decode(payload)
+    per_payload_us = (time.perf_counter() - start) / (rounds * len(payloads)) * 1e6
+
+    tracemalloc.start()
+    kept = [decode(payload) for payload in payloads]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    print(f"{label:<32} {per_payload_us:9.1f} us/payload   "
+          f"peak alloc {peak / len(payloads) / 1024:7.1f} KB/payload (results retained)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON decoding of FMP payloads.")
+    parser.add_argument("--payloads", help="directory of recorded income-statement *.json responses")
+    parser.add_argument("--count", type=int, default=500, help="synthetic payloads to generate")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = recorded_payloads(args.payloads) if args.payloads else synthetic_payloads(args.count)
+    if not payloads:
+        sys.exit("No payloads to benchmark.")
+    size_kb = sum(len(p) for p in payloads) / len(payloads) / 1024
+    print(f"{len(payloads)} payloads, {size_kb:.1f} KB each on average; "
+          f"orjson {'available' if orjson is not None else 'not installed'}")
+
+    measure("json.loads (full payload)", json.loads, payloads, args.rounds)
+    measure("json.loads + projection",
+            lambda p: [{k: s[k] for k in STATEMENT_FIELDS if k in s} for s in json.loads(p)],
+            payloads, args.rounds)
+    measure("decode_json (projected)", lambda p: decode_json(p, STATEMENT_FIELDS),
+            payloads, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Local stand-in for the Financial Modeling Prep API, for offline benchmarks.
+
+Serves /api/v3/profile/{symbols}, /api/v3/income-statement/{symbol} and
+/api/v3/available-traded/list with deterministic fake data. Latency, error
+rate, 429 rate and payload size are configurable.
+
+Run standalone:
+    python benchmarks/mock_fmp_server.py --port 8765 --latency-ms 150
+then point the extractor at it by setting Financial_extract_2.BASE_URL to
+http://127.0.0.1:8765/api/v3.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+class MockSettings:
+    """Behaviour of the mock API. Rates are probabilities per request."""
+
+    def __init__(self, latency_ms=100.0, jitter_ms=50.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1, extra_fields=35, years=5, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.extra_fields = extra_fields  # Padding line items per statement, to set the payload size
+        self.years = years
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def roll(self):
+        """Returns (delay_seconds, uniform draw) for one request."""
+        with self.lock:
+            self.requests += 1
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+            return max(0.0, self.latency_ms + jitter) / 1000, self.random.random()
+
+
+def _seed(symbol):
+    return zlib.crc32(symbol.encode())
+
+
+def fake_profile(symbol):
+    seed = _seed(symbol)
+    return {
+        "symbol": symbol,
+        "companyName": f"{symbol} Holdings Inc.",
+        "industry": f"Industry {seed % 40}",
+        "country": ("US", "GB", "DE", "JP", "CA")[seed % 5],
+        "currency": "USD",
+        "description": "Mock company profile. " * 20
+    }
+
+
+def fake_income_statements(symbol, limit, settings):
+    seed = _seed(symbol)
+    statements = []
+    for offset in range(min(limit, settings.years)):
+        year = 2024 - offset
+        statement = {
+            "date": f"{year}-12-31",
+            "symbol": symbol,
+            "reportedCurrency": "USD",
+            "fiscalYear": str(year),
+            "revenue": (seed % 10 ** 6 + 1) * 10 ** 4 + year
+        }
+        for i in range(settings.extra_fields):
+            statement[f"lineItem{i}"] = (seed * (i + 1)) % 10 ** 9 + 0.5
+        statements.append(statement)
+    return statements
+
+
+def make_handler(settings, universe):
+    class MockFMPHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so pooled clients reuse connections
+        wbufsize = -1  # Send headers and body together; flushed after each request
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload=None, headers=None):
+            body = json.dumps(payload if payload is not None else {}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            delay, draw = settings.roll()
+            time.sleep(delay)
+            if draw < settings.rate_limit_rate:
+                return self._send(429, {"Error Message": "Limit Reach"},
+                                  {"Retry-After": str(settings.retry_after)})
+            if draw < settings.rate_limit_rate + settings.error_rate:
+                return self._send(503, {"Error Message": "Service unavailable"})
+
+            parts = urlsplit(self.path)
+            path = parts.path.rstrip("/")
+            if path.endswith("/available-traded/list"):
+                return self._send(200, [{"symbol": symbol} for symbol in universe])
+            if "/profile/" in path:
+                symbols = path.rsplit("/", 1)[1].split(",")
+                return self._send(200, [fake_profile(s) for s in symbols if s in universe])
+            if "/income-statement/" in path:
+                symbol = path.rsplit("/", 1)[1]
+                if symbol not in universe:
+                    return self._send(200, [])
+                limit = int(parse_qs(parts.query).get("limit", ["5"])[0])
+                return self._send(200, fake_income_statements(symbol, limit, settings))
+            return self._send(404, {"Error Message": "Unknown endpoint"})
+
+    return MockFMPHandler
+
+
+def start_server(settings, universe, host="127.0.0.1", port=0):
+    """Starts the mock API on a background thread. Returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(settings, set(universe)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api/v3"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock FMP API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--symbols", type=int, default=500, help="size of the fake universe")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    settings = MockSettings(latency_ms=args.latency_ms, error_rate=args.error_rate,
+                            rate_limit_rate=args.rate_limit_rate)
+    universe = [f"SYM{i:05d}" for i in range(args.symbols)]
+    server, base_url = start_server(settings, universe, port=args.port)
+    print(f"Mock FMP API on {base_url} ({len(universe)} symbols, e.g. {universe[0]}); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Checks for the bulk income-statement ingest.
+
+iter_bulk_statements is fed small CSVs inline; ingest_bulk_statements reads
+the bulk files under fixtures/bulk/ and must collect the same rows as the
+per-symbol API path given the same statements.
+
+Usage:
+    python -m pytest benchmarks/test_bulk_statements.py
+"""
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "source_script"))
+
+import Financial_extract_2 as fe  # noqa: E402
+
+BULK_DIR = os.path.join(HERE, "fixtures", "bulk")
+BULK_YEARS = [2024, 2023, 2022]
+SYMBOLS = ["AAA", "BBB", "CCC"]
+
+PROFILES = {
+    "AAA": {"symbol": "AAA", "companyName": "Alpha Inc.", "industry": "Software", "country": "US"},
+    "BBB": {"symbol": "BBB", "companyName": "Beta AG", "industry": "Chemicals", "country": "DE"},
+    "CCC": {"symbol": "CCC", "companyName": "Gamma Corp.", "country": "US"}
+}
+
+# What /income-statement returns for the companies in the fixture files
+API_STATEMENTS = {
+    "AAA": [
+        {"date": "2024-12-31", "fiscalYear": "2024", "reportedCurrency": "USD", "revenue": 1000},
+        {"date": "2023-12-31", "fiscalYear": "2023", "reportedCurrency": "USD", "revenue": 900},
+        {"date": "2022-12-31", "fiscalYear": "2022", "reportedCurrency": "USD", "revenue": 800}
+    ],
+    "BBB": [
+        {"date": "2024-09-30", "fiscalYear": "2024", "reportedCurrency": "EUR", "revenue": 2000},
+        {"date": "2023-09-30", "fiscalYear": "2023", "reportedCurrency": "EUR", "revenue": 1900},
+        {"date": "2022-09-30", "fiscalYear": "2022", "reportedCurrency": "EUR", "revenue": 1800}
+    ],
+    "CCC": [
+        {"date": "2024-12-31", "fiscalYear": "2024", "reportedCurrency": "USD"},
+        {"date": "2023-12-31", "fiscalYear": "2023", "reportedCurrency": "USD", "revenue": 3000},
+        {"date": "2022-06-30", "reportedCurrency": "USD", "revenue": 2500}
+    ]
+}
+
+
+def parse(text, symbols=SYMBOLS):
+    return list(fe.iter_bulk_statements(text.splitlines(), symbols))
+
+
+def test_calendar_year_becomes_fiscal_year():
+    rows = parse("symbol,date,calendarYear,revenue\n"
+                 "AAA,2024-12-31,2024,10\n")
+    assert rows == [("AAA", {"date": "2024-12-31", "fiscalYear": "2024", "revenue": "10"})]
+
+
+def test_fiscal_year_column_wins_over_calendar_year():
+    rows = parse("symbol,date,fiscalYear,calendarYear,revenue\n"
+                 "AAA,2024-09-30,2024,2023,10\n"
+                 "BBB,2024-09-30,,2023,20\n")
+    assert [statement["fiscalYear"] for _, statement in rows] == ["2024", "2023"]
+    assert all("calendarYear" not in statement for _, statement in rows)
+
+
+def test_symbols_match_case_insensitively():
+    rows = parse("symbol,revenue\n"
+                 "aaa,1\n"
+                 "Bbb,2\n"
+                 "ZZZ,3\n", symbols=["AAA", "bbb"])
+    assert [symbol for symbol, _ in rows] == ["AAA", "bbb"]
+
+
+def test_short_and_truncated_rows():
+    rows = parse("date,symbol,reportedCurrency,revenue\n"
+                 "2024-12-31\n"
+                 "\n"
+                 "2024-12-31,AAA,USD\n"
+                 "2024-12-31,BBB,EUR,20\n")
+    assert rows == [
+        ("AAA", {"date": "2024-12-31", "reportedCurrency": "USD"}),
+        ("BBB", {"date": "2024-12-31", "reportedCurrency": "EUR", "revenue": "20"})
+    ]
+
+
+def test_empty_file_yields_nothing():
+    assert parse("") == []
+
+
+def test_missing_symbol_column_is_permanent():
+    with pytest.raises(fe.PermanentFetchError):
+        parse("ticker,revenue\nAAA,10\n")
+
+
+def extractor(monkeypatch, statements=None):
+    extractor = fe.FinancialDataExtractor(cache=False, checkpoint_path=None, max_companies=10)
+    monkeypatch.setattr(extractor, "get_company_profiles",
+                        lambda symbols: {s: PROFILES[s] for s in symbols if s in PROFILES})
+    monkeypatch.setattr(extractor, "get_income_statement", lambda symbol: statements[symbol])
+    return extractor
+
+
+def test_bulk_ingest_matches_api_path(monkeypatch):
+    bulk = extractor(monkeypatch)
+    bulk.ingest_bulk_statements(SYMBOLS, years=BULK_YEARS, bulk_dir=BULK_DIR)
+
+    api = extractor(monkeypatch, API_STATEMENTS)
+    api.extract_all_companies(SYMBOLS)
+
+    assert bulk.valid_symbols == api.valid_symbols == SYMBOLS
+    assert bulk._prepare_export_frame().equals(api._prepare_export_frame())
+    assert len(bulk._prepare_export_frame()) == 8
@@ -0,0 +1,81 @@
+"""
+Crash-and-resume check for the extraction checkpoint.
+
+A child process extracts from the mock API and is killed with os._exit part
+way through the sweep, so no finally block gets to save anything. Resuming
+from its checkpoint must then give the same export as an uninterrupted run.
+
+Usage:
+    python -m pytest benchmarks/test_checkpoint_resume.py
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(BENCHMARKS, "..", "source_script")
+sys.path.insert(0, SOURCE)
+sys.path.insert(0, BENCHMARKS)
+
+import Financial_extract_2 as fe  # noqa: E402
+from mock_fmp_server import MockSettings, start_server  # noqa: E402
+
+UNIVERSE = [f"SYM{i:05d}" for i in range(150)]
+MAX_COMPANIES = 120
+KILL_AT = 115  # Between two checkpoint writes
+
+# Runs in the child: extract until KILL_AT symbols are processed, then die
+CRASHING_RUN = f"""
+import os, sys
+sys.path[:0] = [{SOURCE!r}, {BENCHMARKS!r}]
+import Financial_extract_2 as fe
+fe.logger.setLevel("WARNING")
+from mock_fmp_server import MockSettings, start_server
+
+server, fe.BASE_URL = start_server(MockSettings(latency_ms=0, jitter_ms=0), {UNIVERSE!r})
+extractor = fe.FinancialDataExtractor(rate_limiter=fe.RateLimiter(0, 0), cache=False,
+                                      checkpoint_path=sys.argv[1], max_companies={MAX_COMPANIES})
+record_success = extractor._record_success
+
+def record_and_crash(*args):
+    record_success(*args)
+    if len(extractor.processed_symbols) >= {KILL_AT}:
+        os._exit(3)
+
+extractor._record_success = record_and_crash
+extractor.extract_all_companies({UNIVERSE!r})
+"""
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server, url = start_server(MockSettings(latency_ms=0, jitter_ms=0), UNIVERSE)
+    yield url
+    server.shutdown()
+
+
+def extractor(monkeypatch, base_url, checkpoint_path=None):
+    monkeypatch.setattr(fe, "BASE_URL", base_url)
+    return fe.FinancialDataExtractor(rate_limiter=fe.RateLimiter(0, 0), cache=False,
+                                     checkpoint_path=checkpoint_path, max_companies=MAX_COMPANIES)
+
+
+def test_resume_after_kill_matches_uninterrupted_run(tmp_path, monkeypatch, base_url):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    child = subprocess.run([sys.executable, "-c", CRASHING_RUN, checkpoint], cwd=tmp_path)
+    assert child.returncode == 3
+
+    resumed = extractor(monkeypatch, base_url, checkpoint)
+    assert resumed.load_checkpoint()
+    saved = len(resumed.processed_symbols)
+    assert KILL_AT - fe.CHECKPOINT_INTERVAL <= saved < KILL_AT
+    assert len(resumed.data) > 0
+    resumed.extract_all_companies(UNIVERSE)
+
+    full = extractor(monkeypatch, base_url)
+    full.extract_all_companies(UNIVERSE)
+
+    assert resumed.valid_symbols == full.valid_symbols
+    assert resumed._prepare_export_frame().equals(full._prepare_export_frame())
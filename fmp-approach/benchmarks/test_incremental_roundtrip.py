@@ -0,0 +1,55 @@
+"""
+Round-trip check for --incremental: an export read back with
+read_previous_output and merged into a later run must export the same rows,
+including the "N/A" placeholders, in every output format.
+
+Usage:
+    python -m pytest benchmarks/test_incremental_roundtrip.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source_script"))
+
+import Financial_extract_2 as fe  # noqa: E402
+
+SUFFIXES = {"xlsx": ".xlsx", "parquet": "_parquet", "feather": ".feather", "csv": ".csv"}
+
+
+def company_rows(name, industry, country, revenue):
+    return [{"timevalue": str(year), "companyname": name, "industryclassification": industry,
+             "geonameen": country, "revenue": revenue + year, "revenue_unit": "USD"}
+            for year in (2022, 2023, 2024)]
+
+
+def extractor(rows):
+    extractor = fe.FinancialDataExtractor(cache=False, checkpoint_path=None)
+    extractor.data.extend(rows)
+    return extractor
+
+
+def normalized(frame):
+    """Rows as strings in a fixed order; a Parquet dataset reads back partition by partition."""
+    return frame.astype(str).sort_values(["companyname", "timevalue"], ignore_index=True)
+
+
+@pytest.mark.parametrize("output_format", list(fe.EXPORT_WRITERS))
+def test_previous_output_round_trips(tmp_path, output_format):
+    outputs = {output_format: str(tmp_path / f"export{SUFFIXES[output_format]}")}
+    unchanged = (company_rows("Known Corp", "Software", "US", 5_000_000)
+                 + company_rows("Unknown Corp", "N/A", "N/A", 7_000_000))
+    first = extractor(unchanged)
+    assert first.export(outputs)
+
+    target, previous = fe.read_previous_output(outputs)
+    assert target == outputs[output_format]
+    second = extractor(company_rows("New Corp", "Retail", "GB", 9_000_000))
+    second.merge_previous(previous)
+    assert second.export(outputs, incremental=True)
+
+    _, exported = fe.read_previous_output(outputs)
+    kept = exported[exported["companyname"] != "New Corp"]
+    assert normalized(kept).equals(normalized(first._prepare_export_frame()))
+    assert (exported["companyname"] == "New Corp").sum() == 3
@@ -0,0 +1,92 @@
+"""
+Equivalence check for normalize_statements.
+
+The extraction normalizes income statements with the vectorized
+normalize_statements; FinancialDataExtractor._build_rows keeps the per-row
+rules (_process_revenue, _extract_fiscal_year) as the reference. This module
+feeds both the same payloads, randomised and hand-picked, and expects the
+same rows.
+
+Inputs the two knowingly disagree on are left out: revenue strings Python's
+float() accepts but pandas does not ("1_000", full-width digits, "infinity",
+which int() rejects anyway), dates before year 1000, and NaN fiscal years,
+which the JSON decoder never produces.
+
+Usage:
+    python -m pytest benchmarks/test_normalize_statements.py
+"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source_script"))
+
+from Financial_extract_2 import FinancialDataExtractor, normalize_statements  # noqa: E402
+
+MISSING = object()
+
+REVENUES = (
+    0, 1, 7919, 1_000_000_000, 2**53, -1, -0.0, 12.9, -0.4, 3.5e9, 1e-3,
+    "12", " 12 ", "1e3", "-5", "+5", ".5", "12.75", "-0", "nan", "NaN", "", "abc", "1,000",
+    None, MISSING
+)
+FISCAL_YEARS = (2024, 2019, "2023", "FY2022", "", None, 0, False, 2023.0, "0", MISSING)
+DATES = ("2024-12-31", "2021-06-30", "1999-01-01", "2024-02-30", "2024/12/31", "12-31-2024",
+         "", None, MISSING)
+CURRENCIES = ("USD", "EUR", "JPY", "", None, MISSING)
+
+
+def reference_rows(payloads):
+    """normalize_statements' output built with the per-row helpers."""
+    extractor = FinancialDataExtractor(cache=False, checkpoint_path=None)
+    rows = []
+    for symbol, statements in payloads.items():
+        for row in extractor._build_rows({}, statements):
+            rows.append((symbol, row["timevalue"], row["revenue"], row["revenue_unit"]))
+    return list(dict.fromkeys(rows))
+
+
+def normalized_rows(payloads):
+    frame = normalize_statements(payloads)
+    return [(symbol, timevalue, int(revenue), unit) for symbol, timevalue, revenue, unit
+            in frame[["symbol", "timevalue", "revenue", "revenue_unit"]].itertuples(index=False)]
+
+
+def statement(revenue=MISSING, fiscal_year=MISSING, date=MISSING, currency=MISSING):
+    fields = {"revenue": revenue, "fiscalYear": fiscal_year, "date": date, "reportedCurrency": currency}
+    return {name: value for name, value in fields.items() if value is not MISSING}
+
+
+def random_payloads(rng, companies=40):
+    payloads = {}
+    for index in range(companies):
+        statements = [statement(rng.choice(REVENUES), rng.choice(FISCAL_YEARS),
+                                rng.choice(DATES), rng.choice(CURRENCIES))
+                      for _ in range(rng.randint(0, 7))]
+        if statements and rng.random() < 0.3:
+            statements.append(dict(rng.choice(statements)))
+        payloads[f"SYM{index:03d}"] = statements
+    return payloads
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_random_payloads(seed):
+    payloads = random_payloads(random.Random(seed))
+    assert normalized_rows(payloads) == reference_rows(payloads)
+
+
+@pytest.mark.parametrize("payloads", [
+    {},
+    {"EMPTY": []},
+    {"A": [statement(-1, 2024), statement("abc", 2023)]},
+    {"A": [statement(100, 2024, currency="EUR"), statement(100, 2024, currency="EUR")]},
+    {"A": [statement(100, 2024)], "B": [statement(100, 2024)]},
+    {"A": [statement(100, "", "2020-09-30"), statement(100, None, "2020-09-30"),
+           statement(100, 0, "bad-date"), statement(100)]},
+    {"A": [statement(2.5e12, "2024"), statement("2.5e12", 2024)]},
+], ids=["no-companies", "no-statements", "no-revenue", "duplicates", "same-row-two-symbols",
+        "date-fallback", "scientific-notation"])
+def test_edge_cases(payloads):
+    assert normalized_rows(payloads) == reference_rows(payloads)
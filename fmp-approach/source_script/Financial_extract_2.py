@@ -1,21 +1,102 @@
 import os
+import io
+import sys
 import time
+import argparse
+import csv
+import json
+import sqlite3
+import math
+import zlib
+import glob
+import shutil
+import cProfile
+import pstats
+import functools
+from array import array
+from contextlib import contextmanager
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
 import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+try:
+    import orjson  # Optional: several times faster than the stdlib json decoder
+except ImportError:
+    orjson = None
 from dotenv import load_dotenv
 import logging
-from datetime import datetime
-from tenacity import retry, stop_after_attempt, wait_exponential
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, parse_qsl, urlencode
 
 # === CONFIGURATION SETUP ===
 load_dotenv()
+
+
+def env_flag(name, default=False):
+    """Reads a boolean switch such as CACHE_ONLY=1 / true / yes from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
 API_KEY = os.getenv("FMP_API_KEY")
 BASE_URL = "https://financialmodelingprep.com/api/v3"
+BULK_BASE_URL = "https://financialmodelingprep.com/api/v4"
 MAX_COMPANIES = int(os.getenv("MAX_COMPANIES", 120))
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 10))
-RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", 3))
-BASE_DELAY = float(os.getenv("BASE_DELAY", 0.1))
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", 3))  # Attempts per symbol, including the first
+RETRY_BUDGET = int(os.getenv("RETRY_BUDGET", 50))  # Deferred retries allowed per run
+RETRY_MIN_WAIT = float(os.getenv("RETRY_MIN_WAIT", 4))  # Backoff before the first retry pass
+RETRY_MAX_WAIT = float(os.getenv("RETRY_MAX_WAIT", 10))
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", 20))  # Recent requests the circuit breaker watches
+CIRCUIT_ERROR_RATE = float(os.getenv("CIRCUIT_ERROR_RATE", 0.5))  # Failure share that opens the circuit
+CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", 30))  # Seconds before probing FMP again
+CONCURRENCY = int(os.getenv("CONCURRENCY", 8))  # Symbols fetched in parallel (1 = serial)
+POOL_CONNECTIONS = int(os.getenv("POOL_CONNECTIONS", 4))  # Distinct hosts kept pooled
+POOL_MAXSIZE = int(os.getenv("POOL_MAXSIZE", max(CONCURRENCY, 10)))  # Keep-alive connections per host
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", 5))  # 0 disables the per-second budget
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", 300))  # 0 disables the per-minute budget
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 10))
+RATE_LIMIT_COOLDOWN = float(os.getenv("RATE_LIMIT_COOLDOWN", 60))  # Seconds before a 429 slowdown eases off
+RETRY_AFTER_DEFAULT = float(os.getenv("RETRY_AFTER_DEFAULT", 5))  # Pause when a 429 has no Retry-After
 YEARS = 5   # Number of years to fetch income statements for
+PROFILE_BATCH_SIZE = int(os.getenv("PROFILE_BATCH_SIZE", 50))  # Symbols per /profile call
+CACHE_ENABLED = env_flag("CACHE_ENABLED", True)
+CACHE_PATH = os.getenv("CACHE_PATH", "fmp_cache.sqlite")
+CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", 256))  # Least recently used entries are evicted past this
+CACHE_ONLY = env_flag("CACHE_ONLY")  # Offline mode: serve everything from the cache, never call FMP
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", 7 * 24 * 3600))  # Profiles rarely change
+INCOME_CACHE_TTL = int(os.getenv("INCOME_CACHE_TTL", 30 * 24 * 3600))  # Annual statements change yearly
+REFRESH_CACHE_TTL = int(os.getenv("REFRESH_CACHE_TTL", 24 * 3600))  # Statements of companies with gaps, on --incremental
+SYMBOL_LIST_CACHE_TTL = int(os.getenv("SYMBOL_LIST_CACHE_TTL", 24 * 3600))
+BULK_CACHE_DIR = os.getenv("BULK_CACHE_DIR", "bulk_cache")  # Downloaded bulk CSVs; empty disables
+BULK_CACHE_TTL = int(os.getenv("BULK_CACHE_TTL", 30 * 24 * 3600))
+PREFILTER_SYMBOLS = env_flag("PREFILTER_SYMBOLS", True)  # Drop tickers FMP doesn't list before extraction
+OUTPUT_FILES = {  # Default target for each export format
+    "xlsx": "company_financial_data.xlsx",
+    "parquet": "company_financial_data_parquet",
+    "feather": "company_financial_data.feather",
+    "csv": "company_financial_data.csv"
+}
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 50000))  # Rows converted per chunk during export
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "extraction_checkpoint.jsonl")
+CHECKPOINT_INTERVAL = int(os.getenv("CHECKPOINT_INTERVAL", 10))  # Symbols between checkpoint writes
+NORMALIZE_BATCH_SIZE = int(os.getenv("NORMALIZE_BATCH_SIZE", 200))  # Companies per normalize_statements pass
+DEADLINE_EXPORT_MARGIN = float(os.getenv("DEADLINE_EXPORT_MARGIN", 30))  # Seconds of --deadline kept for export
+SHARD_DIR = os.getenv("SHARD_DIR", "shards")  # Where sharded runs write their partial outputs
+METRICS_PATH = os.getenv("METRICS_PATH", "fmp_extraction.prom")  # Prometheus textfile per run; empty disables
+PROFILE_HOT_PATH = env_flag("PROFILE_HOT_PATH")  # cProfile the per-symbol fetch path
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "fmp_hot_path.pstats")
 
 # === LOGGING CONFIGURATION ===
 logging.basicConfig(
@@ -57,48 +138,1337 @@ def load_company_symbols():
     return DEFAULT_COMPANIES
 
 
+def default_bulk_years():
+    """The last YEARS completed fiscal years, newest first."""
+    latest = datetime.now().year - 1
+    return list(range(latest, latest - YEARS, -1))
+
+
+def iter_bulk_statements(lines, symbols):
+    """
+    Stream-parses an FMP bulk income-statement CSV given as an iterable of lines.
+    Yields (symbol, statement) only for the requested symbols, with each statement
+    projected to the fields extract_company_data reads, so memory use does not
+    depend on the size of the bulk file.
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header:
+        return
+    index = {name.strip(): i for i, name in enumerate(header)}
+    if "symbol" not in index:
+        raise PermanentFetchError("Bulk file has no symbol column")
+
+    wanted = {symbol.upper(): symbol for symbol in symbols}
+    symbol_col = index["symbol"]
+    columns = [(name, index[name])
+               for name in ("date", "fiscalYear", "calendarYear", "reportedCurrency", "revenue")
+               if name in index]
+    for record in reader:
+        if len(record) <= symbol_col:
+            continue
+        symbol = wanted.get(record[symbol_col].upper())
+        if symbol is None:
+            continue
+        statement = {name: record[i] for name, i in columns if i < len(record)}
+        # The bulk files label the year calendarYear; the per-symbol endpoint uses fiscalYear
+        if not statement.get("fiscalYear") and statement.get("calendarYear"):
+            statement["fiscalYear"] = statement["calendarYear"]
+        statement.pop("calendarYear", None)
+        yield symbol, statement
+
+
+# Profile attributes copied onto every row: (row column, profile field, default)
+PROFILE_FIELDS = (
+    ("companyname", "companyName", "N/A"),
+    ("industryclassification", "industry", "N/A"),
+    ("geonameen", "country", "N/A")
+)
+
+# Only these fields of the API payloads are read; everything else is dropped on decode
+STATEMENT_FIELDS = ("symbol", "date", "fiscalYear", "reportedCurrency", "revenue")
+PROFILE_PAYLOAD_FIELDS = ("symbol",) + tuple(field for _, field, _ in PROFILE_FIELDS)
+
+
+def decode_json(content, fields=None):
+    """
+    Decodes an API response body with orjson when installed, else the stdlib.
+    With `fields`, each object of a list payload is projected down to those
+    keys straight away, so the full line-item dicts are freed immediately
+    and never reach the cache or the rest of the pipeline.
+    """
+    data = orjson.loads(content) if orjson is not None else json.loads(content)
+    if fields and isinstance(data, list):
+        data = [{key: item[key] for key in fields if key in item} if isinstance(item, dict) else item
+                for item in data]
+    return data
+
+
+def normalize_statements(payloads):
+    """
+    Vectorized normalization of raw FMP income statements.
+    `payloads` maps symbol -> list of statement dicts. Returns one row per kept
+    statement with symbol, timevalue, revenue and revenue_unit: revenue is
+    truncated to an integer with negative and unparseable values dropped, the
+    year comes from fiscalYear or else the date, and duplicate rows are removed.
+    FinancialDataExtractor._process_revenue and _extract_fiscal_year remain the
+    per-row reference implementation of the same rules.
+    """
+    symbols, statements = [], []
+    for symbol, items in payloads.items():
+        for statement in items or ():
+            if isinstance(statement, dict):
+                symbols.append(symbol)
+                statements.append(statement)
+
+    def field(name, default=None):
+        return pd.Series([statement.get(name, default) for statement in statements], dtype=object)
+
+    revenue = np.trunc(pd.to_numeric(field("revenue"), errors="coerce").astype("float64"))
+    keep = np.isfinite(revenue) & (revenue >= 0)
+
+    fiscal = field("fiscalYear")
+    has_fiscal = fiscal.notna() & ~fiscal.isin(["", 0])
+    dates = pd.to_datetime(field("date").where(~has_fiscal), format="%Y-%m-%d", errors="coerce")
+    timevalue = fiscal.astype(str).where(has_fiscal, dates.dt.strftime("%Y").fillna("N/A"))
+
+    normalized = pd.DataFrame({
+        "symbol": pd.Series(symbols, dtype=object),
+        "timevalue": timevalue,
+        "revenue": revenue,
+        "revenue_unit": field("reportedCurrency", "USD")
+    })[keep]
+    normalized["revenue"] = normalized["revenue"].astype("int64")
+    return normalized.drop_duplicates(ignore_index=True)
+
+
+# === ERRORS ===
+class PermanentFetchError(Exception):
+    """Failure that retrying will not fix, such as a 404 or an empty profile or statement."""
+
+
+class TransientFetchError(Exception):
+    """Failure worth retrying later: timeouts, connection errors, 429s and 5xx responses."""
+
+
+class CircuitOpenError(TransientFetchError):
+    """Raised instead of calling FMP while the circuit breaker is open."""
+
+
+class DeadlineExceededError(TransientFetchError):
+    """Raised instead of calling FMP once the run's deadline has passed."""
+
+
+# === RATE LIMITING ===
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now, slowdown=1.0):
+        """
+        Takes one token and returns how many seconds the caller must wait
+        before using it. Tokens may go negative, which queues callers fairly.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate / slowdown)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens * slowdown / self.rate
+
+
+class RateLimiter:
+    """
+    Thread-safe request budget shared by every fetch path.
+    Combines a per-second bucket (sized by the burst) with a per-minute bucket,
+    pauses all callers on HTTP 429 / Retry-After and temporarily halves the rate.
+    The rate is halved at most once per `cooldown`, so a burst of 429s answering
+    requests that were already in flight counts as one.
+    """
+
+    MAX_SLOWDOWN = 16.0
+
+    def __init__(self, per_second=RATE_LIMIT_PER_SECOND, per_minute=RATE_LIMIT_PER_MINUTE,
+                 burst=RATE_LIMIT_BURST, cooldown=RATE_LIMIT_COOLDOWN):
+        self._lock = threading.Lock()
+        self._buckets = []
+        if per_second > 0:
+            self._buckets.append(TokenBucket(per_second, max(1, burst)))
+        if per_minute > 0:
+            self._buckets.append(TokenBucket(per_minute / 60.0, max(1, per_minute)))
+        self.cooldown = cooldown
+        self.slowdown = 1.0
+        self._blocked_until = 0.0
+        self._penalized_at = 0.0
+        self._last_cut = float("-inf")
+
+    def _reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            while self.slowdown > 1.0 and now - self._penalized_at >= self.cooldown:
+                self.slowdown = max(1.0, self.slowdown / 2)
+                self._penalized_at += self.cooldown
+            wait = max(0.0, self._blocked_until - now)
+            for bucket in self._buckets:
+                wait = max(wait, bucket.reserve(now, self.slowdown))
+            return wait
+
+    def acquire(self, timeout=None):
+        """
+        Blocks the calling thread until a request may be sent. Returns False
+        straight away if that would take longer than `timeout` seconds.
+        """
+        wait = self._reserve()
+        if timeout is not None and wait > timeout:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def penalize(self, retry_after=None):
+        """Reacts to a throttling response: pause everyone, then run slower for a while."""
+        delay = RETRY_AFTER_DEFAULT if retry_after is None else max(0.0, retry_after)
+        with self._lock:
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + delay)
+            cut = now - self._last_cut >= self.cooldown
+            if cut:
+                self.slowdown = min(self.MAX_SLOWDOWN, self.slowdown * 2)
+                self._last_cut = now
+            self._penalized_at = now
+            slowdown = self.slowdown
+        if cut:
+            logger.warning(f"Rate limited by API; pausing {delay:.1f}s and slowing down {slowdown:g}x")
+        else:
+            logger.warning(f"Rate limited by API; pausing {delay:.1f}s (already slowed down {slowdown:g}x)")
+
+
+def parse_retry_after(value):
+    """Converts a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return (retry_at - datetime.now(timezone.utc)).total_seconds()
+
+
+class CircuitBreaker:
+    """
+    Watches the outcome of the last `window` requests and opens once the share
+    of transient failures reaches `error_rate`. While open, callers fail fast
+    without touching FMP; after `cooldown` seconds requests are let through again.
+    """
+
+    def __init__(self, window=CIRCUIT_WINDOW, error_rate=CIRCUIT_ERROR_RATE,
+                 cooldown=CIRCUIT_COOLDOWN):
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=max(1, window))
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Returns True if a request may be sent now."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                logger.info("Circuit breaker closed; resuming API calls")
+                self._opened_at = None
+                self._outcomes.clear()
+                return True
+            return False
+
+    def remaining_cooldown(self):
+        """Seconds until an open circuit lets requests through again."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def record(self, success):
+        with self._lock:
+            self._outcomes.append(success)
+            if self._opened_at is not None or len(self._outcomes) < self._outcomes.maxlen:
+                return
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self.error_rate:
+                self._opened_at = time.monotonic()
+                logger.warning(f"Circuit breaker opened: {failures}/{len(self._outcomes)} "
+                               f"recent requests failed; pausing API calls for {self.cooldown:.0f}s")
+
+
+# === HTTP TRANSPORT ===
+class FMPTransport:
+    """
+    Persistent keep-alive session shared by the serial and concurrent paths.
+    `pool_maxsize` caps open connections per host; with `pool_block` set,
+    extra callers wait for a free connection instead of opening throwaway ones.
+    """
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 pool_block=True, timeout=REQUEST_TIMEOUT):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": "FinancialDataExtractor/1.0",
+            "Accept": "application/json",
+            "Connection": "keep-alive"
+        })
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, **kwargs):
+        """Sends a GET over the pooled session."""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+# === RESPONSE CACHE ===
+class CacheMissError(PermanentFetchError):
+    """Raised in cache-only mode when a response was never cached."""
+
+
+class ResponseCache:
+    """
+    SQLite-backed store of decoded API responses, keyed by endpoint path and
+    query with the API key removed. Entries carry their write time so each
+    caller can apply its own TTL; the least recently used ones are evicted
+    once the payloads exceed `max_mb`.
+    """
+
+    PRUNE_EVERY = 100  # Writes between size checks
+
+    def __init__(self, path=CACHE_PATH, max_mb=CACHE_MAX_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    @staticmethod
+    def make_key(url):
+        """Builds a cache key from a request URL, dropping the API key."""
+        parts = urlsplit(url)
+        query = sorted((k, v) for k, v in parse_qsl(parts.query) if k.lower() != "apikey")
+        return f"{parts.path}?{urlencode(query)}" if query else parts.path
+
+    def get(self, key, ttl=None):
+        """Returns the cached payload, or None if absent or older than `ttl` seconds."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (ttl is not None and now - row[1] > ttl):
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def has(self, key, ttl=None):
+        """True if a payload at most `ttl` seconds old is cached; does not touch its LRU time."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+        return row is not None and (ttl is None or time.time() - row[0] <= ttl)
+
+    def set(self, key, payload):
+        """Stores a payload, evicting old entries when the cache grows too large."""
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(payload), now, now))
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def _prune(self):
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the limit so pruning doesn't run on every write
+        excess = total - int(self.max_bytes * 0.9)
+        stale = []
+        for key, size in self._conn.execute(
+                "SELECT key, LENGTH(payload) FROM responses ORDER BY accessed_at"):
+            if excess <= 0:
+                break
+            stale.append((key,))
+            excess -= size
+        with self._conn:
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+        logger.info(f"Evicted {len(stale)} cached responses")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# === METRICS ===
+class Metrics:
+    """
+    Thread-safe run metrics: latency histograms per operation plus labelled
+    counters and gauges, rendered in the Prometheus text exposition format.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    HELP = {
+        "operation_seconds": "Time spent per operation, cache hits included.",
+        "http_responses_total": "HTTP responses from FMP by status code ('error' = no response).",
+        "cache_hits_total": "Requests served from the response cache.",
+        "retries_total": "Symbols re-queued for a deferred retry pass.",
+        "deferred_total": "Transient symbol failures sent to the retry queue.",
+        "rate_limited_total": "Responses that slowed the client rate limiter (429 / Retry-After).",
+        "circuit_rejections_total": "Requests skipped while the circuit breaker was open.",
+        "symbols_total": "Symbols finished this run by outcome.",
+        "run_duration_seconds": "Wall time of the last extraction run.",
+        "run_timestamp_seconds": "Unix time the last extraction run finished.",
+        "rows_collected": "Company-year rows collected by the last run."
+    }
+
+    def __init__(self, labels=None):
+        self.labels = dict(labels or {})  # Constant labels on every series, e.g. the shard
+        self._lock = threading.Lock()
+        self._histograms = {}  # operation -> [cumulative bucket counts, sum, count]
+        self._counters = {}  # (name, sorted label items) -> value
+        self._gauges = {}
+
+    def observe(self, operation, seconds):
+        with self._lock:
+            hist = self._histograms.get(operation)
+            if hist is None:
+                hist = self._histograms[operation] = [[0] * len(self.BUCKETS), 0.0, 0]
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    hist[0][i] += 1
+            hist[1] += seconds
+            hist[2] += 1
+
+    @contextmanager
+    def timed(self, operation):
+        """Records the duration of the block in the operation's histogram, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(operation, time.perf_counter() - start)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def counter(self, name, by=None):
+        """Total of a counter, or {label value: count} when `by` names a label."""
+        with self._lock:
+            values = [(dict(items), value) for (key, items), value in self._counters.items()
+                      if key == name]
+        if by is None:
+            return sum(value for _, value in values)
+        totals = {}
+        for labels, value in values:
+            totals[labels.get(by)] = totals.get(labels.get(by), 0) + value
+        return totals
+
+    def timings(self):
+        """Returns {operation: (count, total seconds)}."""
+        with self._lock:
+            return {operation: (hist[2], hist[1]) for operation, hist in self._histograms.items()}
+
+    def render(self, prefix="fmp_extractor_"):
+        """Renders every metric in the Prometheus text format."""
+        lines = []
+        base = tuple(sorted(self.labels.items()))
+
+        def series(name, items=(), value=0):
+            items = base + tuple(items)
+            labels = "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+            lines.append(f"{prefix}{name}{labels} {value}")
+
+        def header(name, kind):
+            lines.append(f"# HELP {prefix}{name} {self.HELP.get(name, name)}")
+            lines.append(f"# TYPE {prefix}{name} {kind}")
+
+        with self._lock:
+            if self._histograms:
+                name = "operation_seconds"
+                header(name, "histogram")
+                for operation, (buckets, total, count) in sorted(self._histograms.items()):
+                    label = (("operation", operation),)
+                    for bound, value in zip(self.BUCKETS, buckets):
+                        series(f"{name}_bucket", label + (("le", bound),), value)
+                    series(f"{name}_bucket", label + (("le", "+Inf"),), count)
+                    series(f"{name}_sum", label, f"{total:.6f}")
+                    series(f"{name}_count", label, count)
+            for name in sorted({key for key, _ in self._counters}):
+                header(name, "counter")
+                for (key, items), value in sorted(self._counters.items()):
+                    if key == name:
+                        series(name, items, value)
+            for name, value in sorted(self._gauges.items()):
+                header(name, "gauge")
+                series(name, (), value)
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """
+        Writes the metrics for node_exporter's textfile collector. The file is
+        replaced atomically so a scrape never sees a partial write.
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+class HotPathProfiler:
+    """
+    Opt-in cProfile hook for the per-symbol fetch path (PROFILE_HOT_PATH=1).
+    Before Python 3.12 cProfile only sees the thread it is enabled in, so each
+    worker thread gets its own profiler and the stats are merged when the run
+    is reported. From 3.12 a profiler covers the whole interpreter and only one
+    can be active, so a single one is enabled on the first call and runs until
+    the report. If profiling can't start (another profiler or tool is already
+    active), the calls run unprofiled.
+    """
+
+    def __init__(self, output=PROFILE_OUTPUT):
+        self.output = output
+        self._local = threading.local()
+        self._profilers = []
+        self._lock = threading.Lock()
+        self._shared = sys.version_info >= (3, 12)
+        self._unavailable = False
+
+    def _enable(self):
+        """
+        Starts profiling the calling thread. Returns the profiler to disable
+        after the call, or None when the shared profiler keeps running.
+        """
+        if self._shared:
+            with self._lock:
+                if not self._profilers:
+                    profiler = cProfile.Profile()
+                    profiler.enable()
+                    self._profilers.append(profiler)
+            return None
+        profiler = getattr(self._local, "profiler", None)
+        if profiler is not None:
+            profiler.enable()
+            return profiler
+        profiler = cProfile.Profile()
+        profiler.enable()
+        self._local.profiler = profiler
+        with self._lock:
+            self._profilers.append(profiler)
+        return profiler
+
+    def wrap(self, func):
+        """Returns `func` profiled on every call; profiler errors never reach the caller."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if self._unavailable:
+                return func(*args, **kwargs)
+            try:
+                profiler = self._enable()
+            except ValueError as e:
+                with self._lock:
+                    if not self._unavailable:
+                        self._unavailable = True
+                        logger.warning(f"Hot path profiling disabled: {e}")
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        return wrapper
+
+    def report(self, top=20):
+        """Dumps the merged stats to `output` and logs the top entries by cumulative time."""
+        with self._lock:
+            profilers = list(self._profilers)
+        if not profilers:
+            return
+        if self._shared:
+            profilers[0].disable()
+        stream = io.StringIO()
+        stats = pstats.Stats(profilers[0], stream=stream)
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        stats.dump_stats(self.output)
+        stats.sort_stats("cumulative").print_stats(top)
+        logger.info(f"Hot path profile written to {self.output}\n{stream.getvalue()}")
+
+
+# === ROW STORE ===
+class CompanyRowStore:
+    """
+    Columnar accumulator for extracted rows.
+    `timevalue` and `revenue` live in typed arrays, and the company attributes
+    repeated on every year are dictionary-encoded, so each distinct string is
+    stored once. to_frame() wraps the buffers for pandas without copying them.
+    Iterating yields the original row dicts.
+    """
+
+    ENCODED = ("companyname", "industryclassification", "geonameen", "revenue_unit")
+    COLUMNS = ("timevalue",) + ENCODED[:3] + ("revenue", "revenue_unit")
+    MISSING_YEAR = 0  # Stands in for "N/A" in the year column
+    MISSING_CODE = -1  # Stands in for None in encoded columns
+
+    def __init__(self, rows=()):
+        self._lock = threading.Lock()
+        self._years = array("i")
+        self._revenue = array("q")
+        self._codes = {name: array("i") for name in self.ENCODED}
+        self._values = {name: [] for name in self.ENCODED}
+        self._lookup = {name: {} for name in self.ENCODED}
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self._revenue)
+
+    def _encode(self, name, value):
+        if value is None:
+            return self.MISSING_CODE
+        lookup = self._lookup[name]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(self._values[name])
+            self._values[name].append(value)
+        return code
+
+    def _append(self, row):
+        try:
+            year = int(row["timevalue"])
+        except (TypeError, ValueError):
+            year = self.MISSING_YEAR
+        self._years.append(year)
+        self._revenue.append(row["revenue"])
+        for name in self.ENCODED:
+            self._codes[name].append(self._encode(name, row.get(name)))
+
+    def append(self, row):
+        with self._lock:
+            self._append(row)
+
+    def extend(self, rows):
+        with self._lock:
+            for row in rows:
+                self._append(row)
+
+    def extend_frame(self, frame):
+        """
+        Appends rows held in a DataFrame with COLUMNS, column by column,
+        without building a dict per row.
+        """
+        years = pd.to_numeric(frame["timevalue"], errors="coerce").fillna(self.MISSING_YEAR)
+        years = years.to_numpy(dtype=np.int32)
+        revenue = frame["revenue"].to_numpy(dtype=np.int64)
+        with self._lock:
+            self._years.frombytes(years.tobytes())
+            self._revenue.frombytes(revenue.tobytes())
+            for name in self.ENCODED:
+                codes, uniques = pd.factorize(frame[name])
+                # factorize marks missing values as -1, which picks the trailing MISSING_CODE
+                mapping = np.array([self._encode(name, value) for value in uniques]
+                                   + [self.MISSING_CODE], dtype=np.int32)
+                self._codes[name].frombytes(mapping[codes].tobytes())
+
+    def __iter__(self):
+        return self.iter_rows()
+
+    def iter_rows(self, start=0):
+        """Yields the row dicts from position `start` on."""
+        for i in range(start, len(self)):
+            row = {"timevalue": str(self._years[i]) if self._years[i] != self.MISSING_YEAR else "N/A"}
+            for name in self.ENCODED:
+                code = self._codes[name][i]
+                row[name] = self._values[name][code] if code != self.MISSING_CODE else None
+            row["revenue"] = self._revenue[i]
+            yield {name: row[name] for name in self.COLUMNS}
+
+    def to_frame(self):
+        """
+        Builds a DataFrame on top of the store's buffers: nullable Int32 years,
+        int64 revenue and categorical company attributes. The frame shares memory
+        with the store, so drop it before appending more rows.
+        """
+        years = np.frombuffer(self._years, dtype=np.int32)
+        columns = {"timevalue": pd.arrays.IntegerArray(years, years == self.MISSING_YEAR)}
+        for name in self.ENCODED:
+            columns[name] = pd.Categorical.from_codes(
+                np.frombuffer(self._codes[name], dtype=np.int32),
+                categories=pd.Index(self._values[name], dtype=object))
+        columns["revenue"] = np.frombuffer(self._revenue, dtype=np.int64)
+        return pd.DataFrame({name: columns[name] for name in self.COLUMNS}, copy=False)
+
+
+def write_excel_streaming(df, filename, number_formats=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Writes a DataFrame with openpyxl's write-only mode, which streams rows to
+    disk instead of holding the whole workbook in memory. The header, frozen
+    header row and number formats are set up once; each formatted column reuses
+    a single styled cell, and rows are converted from the frame chunk by chunk.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    sheet.freeze_panes = "A2"
+    sheet.append(list(df.columns))
+
+    styled = {}
+    for column, number_format in (number_formats or {}).items():
+        if column in df.columns:
+            cell = WriteOnlyCell(sheet)
+            cell.number_format = number_format
+            styled[df.columns.get_loc(column)] = cell
+
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for values in chunk.itertuples(index=False, name=None):
+            if styled:
+                values = list(values)
+                for i, cell in styled.items():
+                    if values[i] is not None:
+                        # The writer serialises each row on append, so the cell can be reused
+                        cell.value = values[i]
+                        values[i] = cell
+            sheet.append(values)
+
+    workbook.save(filename)
+
+
+def write_parquet_partitioned(df, path):
+    """
+    Writes a Parquet dataset partitioned by fiscal year (timevalue=YYYY/ folders),
+    replacing any dataset already at `path`. It is written next to the old one
+    and swapped in, so years and companies missing from `df` don't linger.
+    """
+    tmp_path, old_path = f"{path}.tmp", f"{path}.old"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    df.to_parquet(tmp_path, index=False, partition_cols=["timevalue"])
+    if os.path.exists(path):
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def write_parquet_changed(df, path):
+    """
+    Incremental variant of write_parquet_partitioned: only fiscal-year
+    partitions whose rows differ from the dataset already at `path` are
+    rewritten, and partitions with no rows left are removed.
+    """
+    if not os.path.isdir(path):
+        write_parquet_partitioned(df, path)
+        return
+    columns = list(CompanyRowStore.COLUMNS)
+    existing = pd.read_parquet(path)[columns]
+    existing["timevalue"] = existing["timevalue"].astype(str)
+
+    def partitions(frame):
+        return {year: sorted(group.astype(str).itertuples(index=False, name=None))
+                for year, group in frame[columns].groupby(frame["timevalue"].astype(str))}
+
+    before, after = partitions(existing), partitions(df)
+    changed = [year for year, rows in after.items() if before.get(year) != rows]
+    if changed:
+        df[df["timevalue"].astype(str).isin(changed)].to_parquet(
+            path, index=False, partition_cols=["timevalue"], existing_data_behavior="delete_matching")
+    for year in before.keys() - after.keys():
+        shutil.rmtree(os.path.join(path, f"timevalue={year}"), ignore_errors=True)
+    logger.info(f"Parquet partitions rewritten: {', '.join(sorted(changed)) or 'none'}")
+
+
+def write_feather(df, filename):
+    """
+    Writes an Arrow IPC (Feather v2) file. It is left uncompressed so readers
+    can memory-map it, e.g. pyarrow.ipc.open_file(pyarrow.memory_map(filename)).
+    """
+    df.reset_index(drop=True).to_feather(filename, compression="uncompressed")
+
+
+def write_csv(df, filename):
+    df.to_csv(filename, index=False)
+
+
+EXPORT_WRITERS = {
+    "xlsx": lambda df, target: write_excel_streaming(df, target, number_formats={"revenue": "0"}),
+    "parquet": write_parquet_partitioned,
+    "feather": write_feather,
+    "csv": write_csv
+}
+
+
+EXPORT_READERS = {  # "N/A" is exported as text, so only empty cells read back as missing
+    "xlsx": lambda target: pd.read_excel(target, engine="openpyxl", keep_default_na=False, na_values=[""]),
+    "parquet": pd.read_parquet,
+    "feather": pd.read_feather,
+    "csv": lambda target: pd.read_csv(target, keep_default_na=False, na_values=[""])
+}
+
+
+def read_previous_output(outputs):
+    """
+    Loads the output of an earlier run from the first {format: target} in
+    `outputs` that exists. Returns (target, frame), or (None, None).
+    """
+    for output_format, target in outputs.items():
+        if not os.path.exists(target):
+            continue
+        frame = EXPORT_READERS[output_format](target)
+        frame = frame[list(CompanyRowStore.COLUMNS)].copy()
+        frame["timevalue"] = frame["timevalue"].astype(str)
+        return target, frame
+    return None, None
+
+
+def find_year_gaps(frame, expected_years):
+    """
+    Maps each company in an exported frame to the expected fiscal years it lacks.
+    Years before a company's earliest reported year are not counted as gaps,
+    since a younger company has no statements to fill them with.
+    """
+    years = pd.to_numeric(frame["timevalue"], errors="coerce")
+    gaps = {}
+    for company, company_years in years.groupby(frame["companyname"].astype(object)):
+        present = set(company_years.dropna().astype(int))
+        earliest = min(present, default=None)
+        gaps[company] = [year for year in expected_years
+                         if year not in present and (earliest is None or year >= earliest)]
+    return gaps
+
+
+def _sort_key(column):
+    """Sort categorical columns by value rather than by first appearance."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.reorder_categories(sorted(column.cat.categories))
+    return column
+
+
 class FinancialDataExtractor:
-    def __init__(self):
-        self.data = []
+    def __init__(self, rate_limiter=None, transport=None, cache=None, cache_only=CACHE_ONLY,
+                 checkpoint_path=CHECKPOINT_PATH, circuit_breaker=None, metrics=None,
+                 max_companies=None):
+        self.data = CompanyRowStore()
+        self.max_companies = MAX_COMPANIES if max_companies is None else max_companies
+        self.refresh_symbols = set()  # Symbols whose cached income statement must be bypassed
+        self.deadline = None  # time.monotonic() after which no new work is started
+        self.deadline_hit = False
+        self.skipped_symbols = []
         self.processed_symbols = set()
         self.failed_symbols = set()
+        self.valid_symbols = []
+        self._unnormalized = []  # (symbol, profile, statements) fetched but not yet turned into rows
+        self.deferred_symbols = {}  # symbol -> last transient error, in first-failure order
+        self.retry_budget = RETRY_BUDGET
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
         self.request_count = 0
+        self.checkpoint_path = checkpoint_path
+        self._since_checkpoint = 0
+        self._checkpointed = None  # What the checkpoint journal holds; None until written this run
+        self.cache_hits = 0
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.transport = transport or FMPTransport()
+        if cache is None and (CACHE_ENABLED or cache_only):
+            cache = ResponseCache()
+        self.cache = cache or None  # cache=False disables caching
+        self.cache_only = cache_only
+        self._count_lock = threading.Lock()
+        self.metrics = metrics or Metrics()
+        self.profiler = HotPathProfiler() if PROFILE_HOT_PATH else None
+        if self.profiler is not None:
+            self._fetch_company_statements = self.profiler.wrap(self._fetch_company_statements)
 
-    @retry(
-        stop=stop_after_attempt(RETRY_ATTEMPTS),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        before_sleep=lambda r: logger.warning(
-            f"Retrying after failure: {r.outcome.exception()}")
-    )
-    def _fetch_api_data(self, url):
+    def close(self):
+        """Releases pooled HTTP connections and the response cache."""
+        self.transport.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def save_checkpoint(self):
         """
-        Makes an HTTP GET request to the API with retry logic.
+        Records progress in the checkpoint journal, one JSON line per write.
+        The first write of a run replaces the file with a full snapshot; later
+        writes only append the rows and symbol changes since the previous one,
+        so a checkpoint costs as much late in a run as early on.
         """
-        headers = {
-            "User-Agent": "FinancialDataExtractor/1.0",
-            "Accept": "application/json"
+        if not self.checkpoint_path:
+            return
+        saved = self._checkpointed
+        if saved is None:
+            self._write_checkpoint_snapshot()
+            return
+        entry = {
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "processed_symbols": sorted(self._checkpoint_processed() - saved["processed"]),
+            "failed_symbols": sorted(self.failed_symbols - saved["failed"]),
+            "cleared_failures": sorted(saved["failed"] - self.failed_symbols),
+            "valid_symbols": self.valid_symbols[saved["valid"]:],
+            "data": list(self.data.iter_rows(saved["rows"]))
         }
-        self.request_count += 1
-        if self.request_count % 10 == 0:
-            time.sleep(BASE_DELAY)
+        if any(entry[key] for key in entry if key != "saved_at"):
+            with open(self.checkpoint_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            saved["processed"].update(entry["processed_symbols"])
+            saved["failed"].update(entry["failed_symbols"])
+            saved["failed"].difference_update(entry["cleared_failures"])
+            saved["valid"] = len(self.valid_symbols)
+            saved["rows"] = len(self.data)
+        self._since_checkpoint = 0
+
+    def _checkpoint_processed(self):
+        """
+        Processed symbols whose rows are in the dataset. Companies still waiting
+        for normalization are left out, so a resumed run fetches them again.
+        """
+        return self.processed_symbols.difference(symbol for symbol, _, _ in self._unnormalized)
+
+    def _write_checkpoint_snapshot(self):
+        """Replaces the journal with one line holding the full state, atomically."""
+        processed = self._checkpoint_processed()
+        state = {
+            "saved_at": datetime.now().isoformat(timespec="seconds"),
+            "processed_symbols": sorted(processed),
+            "failed_symbols": sorted(self.failed_symbols),
+            "valid_symbols": self.valid_symbols,
+            "data": list(self.data)
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(state) + "\n")
+        os.replace(tmp_path, self.checkpoint_path)
+        self._checkpointed = {
+            "processed": processed,
+            "failed": set(self.failed_symbols),
+            "valid": len(self.valid_symbols),
+            "rows": len(self.data)
+        }
+        self._since_checkpoint = 0
+
+    def load_checkpoint(self):
+        """
+        Restores state by replaying the checkpoint journal, then compacts it
+        into a single snapshot line. Returns False if there is none.
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        processed, failed, valid, rows = set(), set(), [], []
+        saved_at = "earlier"
+        with open(self.checkpoint_path) as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # An append cut short by a crash; the entries before it are intact
+                    logger.warning(f"Ignoring incomplete checkpoint entry on line {number}")
+                    break
+                processed.update(entry["processed_symbols"])
+                failed.update(entry["failed_symbols"])
+                failed.difference_update(entry.get("cleared_failures", ()))
+                valid.extend(entry["valid_symbols"])
+                rows.extend(entry["data"])
+                saved_at = entry.get("saved_at", saved_at)
+        self.processed_symbols = processed
+        self.failed_symbols = failed
+        self.valid_symbols = valid
+        self.data = CompanyRowStore(rows)
+        self._write_checkpoint_snapshot()
+        logger.info(f"Resumed from checkpoint saved {saved_at}: "
+                    f"{len(self.processed_symbols)} done, {len(self.failed_symbols)} to retry.")
+        return True
+
+    def clear_checkpoint(self):
+        """Removes the checkpoint once its data has been exported."""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self._checkpointed = None
+
+    def set_deadline(self, seconds):
+        """Stops starting new work `seconds` from now; in-flight requests are capped to fit."""
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+
+    def _time_left(self):
+        if self.deadline is None:
+            return float("inf")
+        return self.deadline - time.monotonic()
+
+    def _out_of_time(self):
+        if self._time_left() <= 0:
+            self.deadline_hit = True
+        return self.deadline_hit
+
+    def order_for_deadline(self, symbols):
+        """
+        Puts symbols whose profile and income statement are both cached first,
+        since they complete without any API call, so a deadline-bounded run
+        finishes as many companies as possible. Order is otherwise kept.
+        """
+        if self.cache is None:
+            return list(symbols)
+        cached, uncached = [], []
+        for symbol in symbols:
+            income_url = f"{BASE_URL}/income-statement/{symbol}?limit={YEARS}&apikey={API_KEY}"
+            warm = (self.cache.has(ResponseCache.make_key(self._profile_url(symbol)), PROFILE_CACHE_TTL)
+                    and self.cache.has(ResponseCache.make_key(income_url), INCOME_CACHE_TTL))
+            (cached if warm else uncached).append(symbol)
+        logger.info(f"Deadline ordering: {len(cached)} cached symbols first, {len(uncached)} after")
+        return cached + uncached
 
-        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        data = response.json()
+    def _record_skipped(self, symbols):
+        """
+        After the deadline cut the run short, lists what was left undone:
+        symbols awaiting a retry or cut off mid-fetch, then the unstarted
+        ones that could still have counted towards MAX_COMPANIES.
+        """
+        if not self.deadline_hit:
+            return
+        skipped = list(dict.fromkeys(self.skipped_symbols))
+        done = self.processed_symbols | self.failed_symbols | set(skipped)
+        room = self.max_companies - len(self.valid_symbols) - len(skipped)
+        for symbol in symbols:
+            if room <= 0:
+                break
+            if symbol not in done:
+                skipped.append(symbol)
+                room -= 1
+        self.skipped_symbols = skipped
+        self.metrics.inc("symbols_total", len(skipped), outcome="skipped")
+        if skipped:
+            logger.warning(f"Deadline reached; {len(skipped)} symbols skipped")
+
+    def _record_success(self, symbol, profile, statements):
+        self._unnormalized.append((symbol, profile, statements))
+        self.processed_symbols.add(symbol)
+        self.failed_symbols.discard(symbol)
+        self.metrics.inc("symbols_total", outcome="processed")
+        if len(self._unnormalized) >= NORMALIZE_BATCH_SIZE:
+            self._flush_statements()
+        self._tick_checkpoint()
+
+    def _flush_statements(self):
+        """
+        Turns the statements of companies committed since the last flush into
+        rows with one normalize_statements pass, appended in commit order.
+        Companies left with at least one row become valid.
+        """
+        batch, self._unnormalized = self._unnormalized, []
+        if not batch:
+            return
+        normalized = normalize_statements({symbol: statements for symbol, _, statements in batch})
+        counts = self._append_normalized(normalized, {symbol: profile for symbol, profile, _ in batch})
+        self.valid_symbols.extend(symbol for symbol, _, _ in batch if counts.get(symbol, 0))
+
+    def _append_normalized(self, normalized, profiles):
+        """
+        Appends normalize_statements rows for the symbols in `profiles`, in that
+        order, with each company's profile attributes. Returns rows per symbol.
+        """
+        rows = normalized[normalized["symbol"].isin(list(profiles))].copy()
+        order = {symbol: i for i, symbol in enumerate(profiles)}
+        rows = rows.sort_values("symbol", key=lambda col: col.map(order), kind="stable")
+        for column, field, default in PROFILE_FIELDS:
+            values = {symbol: profile.get(field, default) for symbol, profile in profiles.items()}
+            rows[column] = rows["symbol"].map(values)
+        self.data.extend_frame(rows)
+        return rows["symbol"].value_counts()
+
+    def _record_failure(self, symbol, error):
+        if isinstance(error, DeadlineExceededError):
+            self.skipped_symbols.append(symbol)
+        elif isinstance(error, TransientFetchError):
+            self.deferred_symbols[symbol] = str(error)
+            self.metrics.inc("deferred_total")
+            logger.warning(f"Deferring {symbol} for a later retry pass: {error}")
+        else:
+            self.failed_symbols.add(symbol)
+            self.metrics.inc("symbols_total", outcome="failed")
+            logger.error(f"Failed to process {symbol}: {error}")
+        self._tick_checkpoint()
+
+    def _deferred_rounds(self):
+        """
+        Yields (delay, symbols) for each retry pass over symbols that failed
+        transiently, with exponential backoff between passes and a per-run
+        retry budget. Symbols still failing afterwards are marked failed.
+        """
+        for attempt in range(1, RETRY_ATTEMPTS):
+            if not self.deferred_symbols or len(self.valid_symbols) >= self.max_companies:
+                break
+            batch = list(self.deferred_symbols)
+            self.deferred_symbols.clear()
+            allowed = batch[:max(0, self.retry_budget)]
+            self.retry_budget -= len(allowed)
+            self.metrics.inc("retries_total", len(allowed))
+            for symbol in batch[len(allowed):]:
+                self.failed_symbols.add(symbol)
+                self.metrics.inc("symbols_total", outcome="failed")
+                logger.error(f"Failed to process {symbol}: retry budget exhausted")
+            if not allowed:
+                break
+            delay = min(RETRY_MAX_WAIT, RETRY_MIN_WAIT * 2 ** (attempt - 1))
+            delay = max(delay, self.circuit_breaker.remaining_cooldown())
+            if delay >= self._time_left():
+                self.deadline_hit = True
+                self.deferred_symbols.update((symbol, "deadline") for symbol in allowed)
+                logger.warning(f"No time left for retry pass {attempt} before the deadline")
+                break
+            logger.info(f"Retry pass {attempt}: {len(allowed)} deferred symbols in {delay:.0f}s")
+            yield delay, allowed
+
+        for symbol, error in self.deferred_symbols.items():
+            if self.deadline_hit:
+                self.skipped_symbols.append(symbol)
+                continue
+            self.failed_symbols.add(symbol)
+            self.metrics.inc("symbols_total", outcome="failed")
+            logger.error(f"Failed to process {symbol}: {error}")
+        self.deferred_symbols.clear()
+
+    def _tick_checkpoint(self):
+        self._since_checkpoint += 1
+        if CHECKPOINT_INTERVAL > 0 and self._since_checkpoint >= CHECKPOINT_INTERVAL:
+            # Companies awaiting normalization would be left out of the checkpoint
+            self._flush_statements()
+            self.save_checkpoint()
+
+    def _send(self, url, **kwargs):
+        """
+        Makes a single HTTP GET request to the API and returns the response.
+        Errors are classified rather than retried in-line: TransientFetchError
+        sends the symbol to the deferred retry queue, PermanentFetchError fails it.
+        """
+        if not self.circuit_breaker.allow():
+            self.metrics.inc("circuit_rejections_total")
+            raise CircuitOpenError("Circuit breaker open; skipping API call")
+        if self.deadline is not None:
+            time_left = self._time_left()
+            if time_left <= 0 or not self.rate_limiter.acquire(timeout=time_left):
+                raise DeadlineExceededError("Deadline reached; skipping API call")
+            kwargs.setdefault("timeout", max(0.5, min(REQUEST_TIMEOUT, self._time_left())))
+        else:
+            self.rate_limiter.acquire()
+        with self._count_lock:
+            self.request_count += 1
+
+        try:
+            with self.metrics.timed("http_request"):
+                response = self.transport.get(url, **kwargs)
+        except requests.RequestException as e:
+            self.metrics.inc("http_responses_total", status="error")
+            self.circuit_breaker.record(False)
+            raise TransientFetchError(f"Request failed: {e}") from e
+
+        status = response.status_code
+        self.metrics.inc("http_responses_total", status=status)
+        if status == 429 or (status >= 400 and "Retry-After" in response.headers):
+            self.metrics.inc("rate_limited_total")
+            self.rate_limiter.penalize(parse_retry_after(response.headers.get("Retry-After")))
+        if status == 429 or status >= 500:
+            self.circuit_breaker.record(False)
+            raise TransientFetchError(f"HTTP {status} from API")
+        self.circuit_breaker.record(True)
+        if status >= 400:
+            raise PermanentFetchError(f"HTTP {status} from API")
+        return response
+
+    def _fetch_api_data(self, url, fields=None):
+        """Fetches and decodes a JSON API response, keeping only `fields` of each item."""
+        response = self._send(url)
+        try:
+            with self.metrics.timed("decode_json"):
+                data = decode_json(response.content, fields)
+        except ValueError as e:
+            raise PermanentFetchError(f"Invalid JSON in API response: {e}") from e
         if not isinstance(data, (list, dict)):
-            raise ValueError("Unexpected API response format")
+            raise PermanentFetchError("Unexpected API response format")
+        return data
+
+    def _cache_lookup(self, url, ttl):
+        """Returns a cached payload for the URL (any age in cache-only mode), or None."""
+        if self.cache is None:
+            return None
+        data = self.cache.get(ResponseCache.make_key(url), None if self.cache_only else ttl)
+        if data is not None:
+            with self._count_lock:
+                self.cache_hits += 1
+            self.metrics.inc("cache_hits_total")
+        return data
+
+    def _cached_fetch(self, url, ttl, fields=None):
+        """
+        Serves a request from the response cache when fresh enough,
+        otherwise fetches it and stores the result.
+        """
+        data = self._cache_lookup(url, ttl)
+        if data is not None:
+            return data
+        if self.cache_only:
+            raise CacheMissError(f"{ResponseCache.make_key(url)} is not cached (cache-only mode)")
+        data = self._fetch_api_data(url, fields)
+        if self.cache is not None:
+            self.cache.set(ResponseCache.make_key(url), data)
         return data
 
+    def _profile_url(self, symbol):
+        return f"{BASE_URL}/profile/{symbol}?apikey={API_KEY}"
+
     def get_company_profile(self, symbol):
         """Fetches the company profile details for a symbol."""
-        url = f"{BASE_URL}/profile/{symbol}?apikey={API_KEY}"
-        result = self._fetch_api_data(url)
+        with self.metrics.timed("get_company_profile"):
+            result = self._cached_fetch(self._profile_url(symbol), PROFILE_CACHE_TTL,
+                                        PROFILE_PAYLOAD_FIELDS)
         return result[0] if result and isinstance(result, list) else None
 
+    def get_company_profiles(self, symbols):
+        """
+        Fetches profiles for several symbols with one comma-separated call.
+        Returns a dict keyed by the requested symbols; missing ones are left out.
+        Profiles are cached per symbol, so only uncached symbols hit the API.
+        """
+        with self.metrics.timed("get_company_profiles"):
+            return self._get_company_profiles(symbols)
+
+    def _get_company_profiles(self, symbols):
+        profiles, uncached = {}, []
+        for symbol in symbols:
+            cached = self._cache_lookup(self._profile_url(symbol), PROFILE_CACHE_TTL)
+            if cached is None:
+                uncached.append(symbol)
+            elif cached and isinstance(cached, list):
+                profiles[symbol] = cached[0]
+        if not uncached or self.cache_only:
+            return profiles
+
+        url = f"{BASE_URL}/profile/{','.join(uncached)}?apikey={API_KEY}"
+        result = self._fetch_api_data(url, PROFILE_PAYLOAD_FIELDS)
+        found = {}
+        if isinstance(result, list):
+            for profile in result:
+                if isinstance(profile, dict) and profile.get("symbol"):
+                    found[profile["symbol"].upper()] = profile
+        for symbol in uncached:
+            profile = found.get(symbol.upper())
+            if profile is not None:
+                profiles[symbol] = profile
+            if self.cache is not None:
+                # Unknown symbols are cached as empty results so they fail fast next run
+                self.cache.set(ResponseCache.make_key(self._profile_url(symbol)),
+                               [profile] if profile is not None else [])
+        return profiles
+
+    def iter_profile_batches(self, symbols, batch_size=PROFILE_BATCH_SIZE):
+        """
+        Lazily yields (symbol, profiles) for every unprocessed symbol, loading
+        profiles one group of `batch_size` at a time. `profiles` is None when
+        the group call failed permanently (e.g. the plan does not allow batch
+        calls), so the caller falls back to a per-symbol lookup. When it failed
+        transiently (429, 5xx, open circuit) `profiles` is that error instead:
+        the whole group is deferred rather than turned into one call per symbol
+        while FMP is struggling.
+        """
+        pending = [symbol for symbol in symbols if symbol not in self.processed_symbols]
+        for start in range(0, len(pending), batch_size):
+            group = pending[start:start + batch_size]
+            try:
+                profiles = self.get_company_profiles(group)
+            except TransientFetchError as e:
+                logger.warning(f"Batch profile lookup failed; deferring {len(group)} symbols: {e}")
+                profiles = e
+            except PermanentFetchError as e:
+                logger.warning(f"Batch profile lookup failed, falling back to single lookups: {e}")
+                profiles = None
+            else:
+                if len(profiles) < len(group):
+                    missing = [symbol for symbol in group if symbol not in profiles]
+                    logger.warning(f"No profile returned for: {', '.join(missing)}")
+            for symbol in group:
+                yield symbol, profiles
+
+    def get_tradable_symbols(self):
+        """
+        Loads FMP's list of tradable symbols with one bulk call.
+        Only the tickers are cached, so warm runs skip the multi-megabyte payload.
+        """
+        url = f"{BASE_URL}/available-traded/list?apikey={API_KEY}"
+        symbols = self._cache_lookup(url, SYMBOL_LIST_CACHE_TTL)
+        if symbols is None:
+            if self.cache_only:
+                raise CacheMissError("Tradable symbol list is not cached (cache-only mode)")
+            result = self._fetch_api_data(url, ("symbol",))
+            symbols = [item["symbol"] for item in result
+                       if isinstance(item, dict) and item.get("symbol")]
+            if self.cache is not None:
+                self.cache.set(ResponseCache.make_key(url), symbols)
+        return {symbol.upper() for symbol in symbols}
+
+    def prefilter_symbols(self, symbols):
+        """
+        Drops symbols FMP does not list as tradable before any per-symbol request
+        is made. Dropped symbols are reported and recorded as failed. If the list
+        cannot be loaded, the input is returned unchanged.
+        """
+        try:
+            tradable = self.get_tradable_symbols()
+        except Exception as e:
+            logger.warning(f"Symbol prefilter skipped: {e}")
+            return list(symbols)
+        if not tradable:
+            logger.warning("Symbol prefilter skipped: empty tradable symbol list")
+            return list(symbols)
+
+        known, unknown = [], []
+        for symbol in symbols:
+            (known if symbol.upper() in tradable else unknown).append(symbol)
+        if unknown:
+            self.failed_symbols.update(unknown)
+            self.metrics.inc("symbols_total", len(unknown), outcome="not_listed")
+            logger.warning(f"Skipping {len(unknown)} symbols not listed by FMP: {', '.join(unknown)}")
+        logger.info(f"Prefilter kept {len(known)} of {len(known) + len(unknown)} symbols.")
+        return known
+
     def get_income_statement(self, symbol):
         """Fetches the last few years of income statement data."""
         url = f"{BASE_URL}/income-statement/{symbol}?limit={YEARS}&apikey={API_KEY}"
-        return self._fetch_api_data(url)
+        ttl = REFRESH_CACHE_TTL if symbol in self.refresh_symbols else INCOME_CACHE_TTL
+        with self.metrics.timed("get_income_statement"):
+            return self._cached_fetch(url, ttl, STATEMENT_FIELDS)
 
     def _extract_fiscal_year(self, statement):
         """Extracts the fiscal year from income statement entry."""
@@ -122,109 +1492,759 @@ class FinancialDataExtractor:
         except (ValueError, TypeError):
             return None
 
-    def extract_company_data(self, symbol):
+    def _fetch_company_statements(self, symbol, profiles=None):
         """
-        Pulls and processes financial data for a single company.
-        Adds clean entries to the internal dataset.
+        Fetches the profile and income statements of a single company.
+        Returns (profile, statements) without touching the internal dataset,
+        so it can run on worker threads; rows are built when the company is
+        committed, in batches. `profiles` is a batch result from
+        get_company_profiles; without it the profile is fetched on its own,
+        and a transient batch error is raised so the symbol is deferred.
         """
-        if symbol in self.processed_symbols:
-            return
-
-        try:
-            logger.info(f"Processing {symbol}")
+        logger.info(f"Processing {symbol}")
+        if isinstance(profiles, TransientFetchError):
+            raise profiles
+        if profiles is None:
             profile = self.get_company_profile(symbol)
-            if not profile:
-                raise ValueError("Missing company profile")
+        else:
+            profile = profiles.get(symbol)
+        if not profile:
+            raise PermanentFetchError("Missing company profile")
 
-            statements = self.get_income_statement(symbol)
-            if not statements or not isinstance(statements, list):
-                raise ValueError("Missing income statement data")
+        statements = self.get_income_statement(symbol)
+        if not statements or not isinstance(statements, list):
+            raise PermanentFetchError("Missing income statement data")
+        return profile, statements
 
-            for statement in statements:
-                revenue = self._process_revenue(statement.get("revenue"))
-                if revenue is None:
-                    continue
+    def _build_rows(self, profile, statements):
+        """
+        Turns a profile and its income statements into clean dataset rows, one
+        statement at a time. The extraction uses normalize_statements instead;
+        this is the reference it is checked against.
+        """
+        rows = []
+        for statement in statements:
+            revenue = self._process_revenue(statement.get("revenue"))
+            if revenue is None:
+                continue
 
-                self.data.append({
-                    "timevalue": self._extract_fiscal_year(statement),
-                    "companyname": profile.get("companyName", "N/A"),
-                    "industryclassification": profile.get("industry", "N/A"),
-                    "geonameen": profile.get("country", "N/A"),
-                    "revenue": revenue,
-                    "revenue_unit": statement.get("reportedCurrency", "USD")
-                })
+            rows.append({
+                "timevalue": self._extract_fiscal_year(statement),
+                "companyname": profile.get("companyName", "N/A"),
+                "industryclassification": profile.get("industry", "N/A"),
+                "geonameen": profile.get("country", "N/A"),
+                "revenue": revenue,
+                "revenue_unit": statement.get("reportedCurrency", "USD")
+            })
+        return rows
 
-            self.processed_symbols.add(symbol)
+    def extract_company_data(self, symbol, profiles=None):
+        """
+        Pulls and processes financial data for a single company.
+        Its clean entries reach the internal dataset with the next
+        normalization batch (_flush_statements).
+        """
+        if symbol in self.processed_symbols:
+            return
 
+        try:
+            profile, statements = self._fetch_company_statements(symbol, profiles)
         except Exception as e:
-            self.failed_symbols.add(symbol)
-            logger.error(f"Failed to process {symbol}: {e}")
+            self._record_failure(symbol, e)
+            return
+
+        self._record_success(symbol, profile, statements)
 
     def extract_all_companies(self, symbols):
         """
         Iterates through a list of symbols and collects data
         until the defined limit is reached.
         """
-        valid_symbols = []
-        for symbol in symbols:
-            if len(valid_symbols) >= MAX_COMPANIES:
+        remaining = self.iter_profile_batches(symbols)
+        try:
+            while True:
+                self._sweep(remaining)
+                if not self.deferred_symbols:
+                    break
+                # Retries may free up slots, so the main sweep resumes afterwards
+                for delay, retry in self._deferred_rounds():
+                    time.sleep(delay)
+                    self._sweep(self.iter_profile_batches(retry))
+            self._record_skipped(symbols)
+        finally:
+            self._flush_statements()
+            self.save_checkpoint()
+        logger.info(f"Successfully collected data for {len(self.valid_symbols)} companies.")
+
+    def _has_capacity(self, in_flight=0):
+        """
+        True while more companies can count towards MAX_COMPANIES. Deferred ones
+        hold a slot, and so do committed ones awaiting normalization until a
+        flush shows whether they have rows; it is forced when they are the
+        only thing in the way.
+        """
+        def used():
+            return (len(self.valid_symbols) + len(self.deferred_symbols) + in_flight
+                    + len(self._unnormalized))
+
+        if self._unnormalized and used() >= self.max_companies:
+            self._flush_statements()
+        return used() < self.max_companies
+
+    @contextmanager
+    def _bulk_lines(self, year, bulk_dir=None):
+        """
+        Yields the lines of the annual bulk income-statement CSV for `year`,
+        read from `bulk_dir` when given, else from the bulk file cache, else
+        streamed from FMP.
+        """
+        path = (os.path.join(bulk_dir, f"income-statement-bulk-{year}.csv") if bulk_dir
+                else self._cached_bulk_file(year))
+        if path:
+            with open(path, newline="") as f:
+                yield f
+            return
+
+        response = self._send(self._bulk_url(year), stream=True)
+        try:
+            response.encoding = response.encoding or "utf-8"
+            yield response.iter_lines(decode_unicode=True)
+        finally:
+            response.close()
+
+    def _bulk_url(self, year):
+        return f"{BULK_BASE_URL}/income-statement-bulk?year={year}&period=annual&apikey={API_KEY}"
+
+    def _cached_bulk_file(self, year):
+        """
+        Path of the bulk CSV for `year` under BULK_CACHE_DIR, downloaded first
+        when missing or older than BULK_CACHE_TTL (any age in cache-only mode).
+        Returns None when caching is off, so the caller streams from FMP.
+        """
+        path = None
+        if self.cache is not None and BULK_CACHE_DIR:
+            path = os.path.join(BULK_CACHE_DIR, f"income-statement-bulk-{year}.csv")
+            if os.path.exists(path) and (self.cache_only
+                                         or time.time() - os.path.getmtime(path) <= BULK_CACHE_TTL):
+                with self._count_lock:
+                    self.cache_hits += 1
+                self.metrics.inc("cache_hits_total")
+                return path
+        if self.cache_only:
+            raise CacheMissError(f"Bulk income statements for {year} are not cached (cache-only mode)")
+        if path is None:
+            return None
+
+        os.makedirs(BULK_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        response = self._send(self._bulk_url(year), stream=True)
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
+                    f.write(chunk)
+        finally:
+            response.close()
+        os.replace(tmp_path, path)
+        logger.info(f"Cached bulk income statements for {year} in {path}")
+        return path
+
+    def ingest_bulk_statements(self, symbols, years=None, bulk_dir=None):
+        """
+        Alternate ingest mode: downloads FMP's bulk income-statement file once per
+        fiscal year instead of calling get_income_statement per symbol. Only the
+        rows for `symbols` are kept; profiles still come from the batched loader
+        and all statements go through normalize_statements in one pass.
+        """
+        years = years or default_bulk_years()
+        statements = {}
+        for year in years:
+            try:
+                with self.metrics.timed("bulk_statements"), self._bulk_lines(year, bulk_dir) as lines:
+                    for symbol, statement in iter_bulk_statements(lines, symbols):
+                        statements.setdefault(symbol, []).append(statement)
+            except Exception as e:
+                if isinstance(e, DeadlineExceededError) or (
+                        isinstance(e, TransientFetchError) and self._out_of_time()):
+                    # Without every year the statements are incomplete; leave all symbols to the next run
+                    self.deadline_hit = True
+                    logger.warning(f"Deadline reached while loading bulk income statements for {year}")
+                    break
+                logger.error(f"Bulk income statements for {year} failed: {e}")
+        logger.info(f"Bulk files covered {len(statements)} of {len(symbols)} symbols.")
+
+        for symbol, items in statements.items():
+            items.sort(key=lambda st: st.get("date", ""), reverse=True)
+            del items[YEARS:]
+        normalized = normalize_statements(statements)
+        row_counts = normalized["symbol"].value_counts()
+
+        accepted = {}  # symbol -> profile
+        accepted_valid = 0
+        for symbol, profiles in self.iter_profile_batches(symbols):
+            if len(self.valid_symbols) + accepted_valid >= self.max_companies or self._out_of_time():
+                break
+            try:
+                if isinstance(profiles, TransientFetchError):
+                    raise profiles
+                profile = (self.get_company_profile(symbol) if profiles is None
+                           else profiles.get(symbol))
+                if not profile:
+                    raise PermanentFetchError("Missing company profile")
+                if not statements.get(symbol):
+                    raise PermanentFetchError("Missing income statement data")
+            except Exception as e:
+                if isinstance(e, DeadlineExceededError) or (
+                        isinstance(e, TransientFetchError) and self._out_of_time()):
+                    # Cut off by the deadline, not failed; _record_skipped lists it
+                    self.deadline_hit = True
+                    self.skipped_symbols.append(symbol)
+                    continue
+                # No per-symbol retry pass in bulk mode; the next run picks it up
+                self.failed_symbols.add(symbol)
+                self.metrics.inc("symbols_total", outcome="failed")
+                logger.error(f"Failed to process {symbol}: {e}")
+                continue
+            accepted[symbol] = profile
+            accepted_valid += bool(row_counts.get(symbol, 0))
+
+        try:
+            counts = self._append_normalized(normalized, accepted)
+            self.metrics.inc("symbols_total", len(accepted), outcome="processed")
+            for symbol in accepted:
+                self.processed_symbols.add(symbol)
+                self.failed_symbols.discard(symbol)
+                if counts.get(symbol, 0):
+                    self.valid_symbols.append(symbol)
+            self._record_skipped(symbols)
+        finally:
+            self.save_checkpoint()
+        logger.info(f"Successfully collected data for {len(self.valid_symbols)} companies.")
+
+    def _sweep(self, items):
+        """Serially processes (symbol, profiles) pairs until MAX_COMPANIES is reached."""
+        while self._has_capacity() and not self._out_of_time():
+            item = next(items, None)
+            if item is None:
                 break
-            before = len(self.data)
-            self.extract_company_data(symbol)
-            after = len(self.data)
-            if after > before:
-                valid_symbols.append(symbol)
-        logger.info(f"Successfully collected data for {len(valid_symbols)} companies.")
+            self.extract_company_data(*item)
+        self._flush_statements()
 
-    def export_to_excel(self, filename="company_financial_data.xlsx"):
+    async def extract_all_companies_async(self, symbols, concurrency=CONCURRENCY):
         """
-        Exports the cleaned financial data to an Excel file.
+        Concurrent variant of extract_all_companies.
+
+        Up to `concurrency` symbols are fetched at once on a thread pool.
+        Results are committed in input order and no more symbols are in
+        flight than could still count towards MAX_COMPANIES, so the
+        collected dataset matches the serial run.
+        """
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            remaining = self.iter_profile_batches(symbols)
+            try:
+                while True:
+                    await self._sweep_async(loop, executor, remaining, concurrency)
+                    if not self.deferred_symbols:
+                        break
+                    for delay, retry in self._deferred_rounds():
+                        await asyncio.sleep(delay)
+                        await self._sweep_async(loop, executor, self.iter_profile_batches(retry),
+                                                concurrency)
+                self._record_skipped(symbols)
+            finally:
+                self._flush_statements()
+                self.save_checkpoint()
+
+        logger.info(f"Successfully collected data for {len(self.valid_symbols)} companies.")
+
+    async def _sweep_async(self, loop, executor, items, concurrency):
+        """Keeps up to `concurrency` symbols in flight and commits them in input order."""
+        pending = deque()
+        while True:
+            while (len(pending) < concurrency and self._has_capacity(len(pending))
+                   and not self._out_of_time()):
+                # Pulling the next symbol may load a profile batch, so do it off the loop
+                item = await loop.run_in_executor(executor, next, items, None)
+                if item is None:
+                    break
+                symbol, profiles = item
+                if symbol in self.processed_symbols or any(symbol == s for s, _ in pending):
+                    continue
+                future = loop.run_in_executor(
+                    executor, self._fetch_company_statements, symbol, profiles)
+                pending.append((symbol, future))
+
+            if not pending:
+                break
+
+            symbol, future = pending.popleft()
+            try:
+                profile, statements = await future
+            except Exception as e:
+                self._record_failure(symbol, e)
+                continue
+
+            self._record_success(symbol, profile, statements)
+        self._flush_statements()
+
+    def plan_refresh(self, symbols, previous, expected_years=None):
+        """
+        Incremental refresh: compares the previous output with the expected
+        fiscal years (default_bulk_years) and returns only the symbols that
+        need fetching. Companies are matched to symbols through their cached
+        profiles. Complete companies are skipped and count towards
+        MAX_COMPANIES; companies with gaps only reuse an income statement cached
+        within REFRESH_CACHE_TTL, so new filings are picked up without refetching
+        a gap FMP never fills on every run.
+        """
+        expected_years = expected_years or default_bulk_years()
+        gaps = find_year_gaps(previous, expected_years)
+        stale, complete = [], 0
+        for start in range(0, len(symbols), PROFILE_BATCH_SIZE):
+            group = symbols[start:start + PROFILE_BATCH_SIZE]
+            try:
+                profiles = self.get_company_profiles(group)
+            except Exception as e:
+                logger.warning(f"Profile lookup failed; refreshing {len(group)} symbols in full: {e}")
+                profiles = {}
+            for symbol in group:
+                company = (profiles.get(symbol) or {}).get("companyName")
+                if company in gaps and not gaps[company]:
+                    complete += 1
+                    continue
+                if company in gaps:
+                    self.refresh_symbols.add(symbol)
+                stale.append(symbol)
+
+        self.max_companies = max(0, self.max_companies - complete)
+        logger.info(f"Incremental refresh: {complete} companies complete for "
+                    f"{min(expected_years)}-{max(expected_years)}, {len(self.refresh_symbols)} "
+                    f"with gaps, {len(stale) - len(self.refresh_symbols)} new or unmatched")
+        return stale
+
+    def merge_previous(self, previous):
+        """
+        Folds the previous output into the collected data. Companies fetched
+        in this run replace their old rows; all other rows are kept as they were.
+        """
+        fresh = self.data.to_frame()
+        refreshed = set(fresh["companyname"].dropna().astype(object))
+        kept = previous[~previous["companyname"].isin(refreshed)]
+        store = CompanyRowStore()
+        store.extend_frame(kept)
+        store.extend_frame(fresh)
+        del fresh
+        self.data = store
+        logger.info(f"Kept {len(kept)} previous rows; {len(refreshed)} companies refreshed.")
+
+    def _prepare_export_frame(self):
+        """Deduplicates, filters and sorts the collected rows for export."""
+        df = self.data.to_frame()
+        df = df.drop_duplicates()
+        df = df[df['timevalue'].notna()]
+        df = df.sort_values(['companyname', 'timevalue'], ascending=[True, False], key=_sort_key)
+        df['timevalue'] = df['timevalue'].astype(str)
+        return df
+
+    def export(self, outputs, incremental=False):
+        """
+        Exports the cleaned financial data to every {format: target} in `outputs`.
+        The export frame is prepared once and shared by all writers. With
+        `incremental`, Parquet datasets only get their changed partitions rewritten.
+        Returns True only if every format was written.
         """
         if not self.data:
             logger.warning("No data to export.")
             return False
 
         try:
-            df = pd.DataFrame(self.data)
-            df = df.drop_duplicates()
-            df = df[df['timevalue'] != "N/A"]
-            df = df[df['revenue'].notna()]
-            df['revenue'] = pd.to_numeric(df['revenue'], errors='coerce').astype('Int64')
-            df = df.sort_values(['companyname', 'timevalue'], ascending=[True, False])
-
-            with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False)
-                writer.sheets['Sheet1'].freeze_panes = 'A2'
-
-            logger.info(f"Exported {len(df)} records to {filename}")
-            if self.failed_symbols:
-                logger.warning(f"Failed symbols: {', '.join(self.failed_symbols)}")
-            return True
-
+            with self.metrics.timed("export_prepare"):
+                df = self._prepare_export_frame()
         except Exception as e:
-            logger.error(f"Excel export failed: {e}", exc_info=True)
+            logger.error(f"Preparing export data failed: {e}", exc_info=True)
             return False
 
+        success = True
+        for output_format, target in outputs.items():
+            operation = "export_to_excel" if output_format == "xlsx" else f"export_to_{output_format}"
+            try:
+                writer = EXPORT_WRITERS[output_format]
+                if incremental and output_format == "parquet":
+                    writer = write_parquet_changed
+                with self.metrics.timed(operation):
+                    writer(df, target)
+                logger.info(f"Exported {len(df)} records to {target}")
+            except Exception as e:
+                logger.error(f"{output_format} export failed: {e}", exc_info=True)
+                success = False
+
+        if self.failed_symbols:
+            logger.warning(f"Failed symbols: {', '.join(self.failed_symbols)}")
+        return success
+
+    def report_run(self, elapsed, metrics_path=METRICS_PATH):
+        """
+        Logs a summary of where the run spent its time and writes the metrics
+        to a Prometheus textfile (skipped when `metrics_path` is empty).
+        """
+        metrics = self.metrics
+        metrics.set_gauge("run_duration_seconds", round(elapsed, 3))
+        metrics.set_gauge("run_timestamp_seconds", int(time.time()))
+        metrics.set_gauge("rows_collected", len(self.data))
+
+        statuses = metrics.counter("http_responses_total", by="status")
+        status_text = ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))
+        status_text = status_text or "none"
+        logger.info(
+            f"Run summary: {elapsed:.1f}s, {len(self.valid_symbols)} companies with data, "
+            f"{len(self.processed_symbols)} processed, {len(self.failed_symbols)} failed, "
+            f"{len(self.skipped_symbols)} skipped, {len(self.data)} rows")
+        if self.skipped_symbols:
+            logger.info(f"Skipped at the deadline: {', '.join(self.skipped_symbols)}")
+        logger.info(
+            f"Requests: {self.request_count} ({status_text}), {self.cache_hits} cache hits, "
+            f"{metrics.counter('retries_total')} retries, "
+            f"{metrics.counter('rate_limited_total')} rate-limited, "
+            f"{metrics.counter('circuit_rejections_total')} circuit rejections")
+        for operation, (count, total) in sorted(metrics.timings().items(),
+                                                 key=lambda item: -item[1][1]):
+            logger.info(f"  {operation:<22} {count:7d} calls {total:9.2f}s total "
+                        f"{total / count * 1000:9.1f}ms avg")
+
+        if self.profiler is not None:
+            self.profiler.report()
+        if metrics_path:
+            try:
+                metrics.write_textfile(metrics_path)
+                logger.info(f"Metrics written to {metrics_path}")
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {metrics_path}: {e}")
+
+    def export_to_excel(self, filename=OUTPUT_FILES["xlsx"]):
+        """
+        Exports the cleaned financial data to an Excel file.
+        """
+        return self.export({"xlsx": filename})
+
+    def export_to_parquet(self, path=OUTPUT_FILES["parquet"]):
+        """Exports to a Parquet dataset partitioned by fiscal year."""
+        return self.export({"parquet": path})
 
-def main():
+    def export_to_feather(self, filename=OUTPUT_FILES["feather"]):
+        """Exports to an uncompressed Arrow IPC / Feather file for memory-mapped reads."""
+        return self.export({"feather": filename})
+
+    def export_to_csv(self, filename=OUTPUT_FILES["csv"]):
+        """Exports to a plain CSV file."""
+        return self.export({"csv": filename})
+
+    def write_partial(self, path):
+        """
+        Writes the collected rows, as collected, to a Feather partial for
+        merge_partials. Dedup and sorting are left to the merge step.
+        An empty partial is still written so the merge can tell the shard ran.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        self.data.to_frame().to_feather(tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+        logger.info(f"Wrote {len(self.data)} rows to shard partial {path}")
+
+
+# === SHARDING ===
+def shard_of(symbol, shard_count):
+    """
+    Stable shard index for a symbol. crc32 gives the same answer in every
+    process and on every machine, unlike the salted built-in hash().
+    """
+    return zlib.crc32(symbol.strip().upper().encode()) % shard_count
+
+
+def select_shard(symbols, index, count):
+    """The symbols assigned to shard `index` of `count`, in their original order."""
+    return [symbol for symbol in symbols if shard_of(symbol, count) == index]
+
+
+def shard_partial_path(index, count, shard_dir=SHARD_DIR):
+    return os.path.join(shard_dir, f"part-{index:04d}-of-{count:04d}.feather")
+
+
+def _shard_checkpoint_path(index, count):
+    if not CHECKPOINT_PATH:
+        return CHECKPOINT_PATH
+    root, ext = os.path.splitext(CHECKPOINT_PATH)
+    return f"{root}.shard-{index}-of-{count}{ext}"
+
+
+def _shard_metrics_path(index, count):
+    if not METRICS_PATH:
+        return METRICS_PATH
+    root, ext = os.path.splitext(METRICS_PATH)
+    return f"{root}.shard-{index}-of-{count}{ext}"
+
+
+def run_extraction(extractor, symbols, mode="api", bulk_dir=None):
+    """Prefilters `symbols` and runs the extraction mode selected on the command line."""
+    if PREFILTER_SYMBOLS and symbols:
+        symbols = extractor.prefilter_symbols(symbols)
+    if extractor.deadline is not None:
+        symbols = extractor.order_for_deadline(symbols)
+    if mode == "bulk":
+        extractor.ingest_bulk_statements(symbols, bulk_dir=bulk_dir)
+    elif CONCURRENCY > 1:
+        asyncio.run(extractor.extract_all_companies_async(symbols))
+    else:
+        extractor.extract_all_companies(symbols)
+
+
+def extraction_deadline(deadline):
+    """Seconds of a --deadline available for extraction, keeping DEADLINE_EXPORT_MARGIN for the export."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - min(DEADLINE_EXPORT_MARGIN, deadline / 2))
+
+
+def run_shard(index, count, mode="api", bulk_dir=None, resume=False, rate_share=1, deadline=None):
+    """
+    Extracts one shard of the symbol list and writes its partial output.
+    Each shard keeps its own checkpoint and gets an equal share of MAX_COMPANIES.
+    `rate_share` splits the API rate limit between shards that share one IP.
+    Returns the partial's path, or None if it could not be written.
+    """
+    symbols = select_shard(load_company_symbols(), index, count)
+    logger.info(f"Shard {index}/{count}: {len(symbols)} symbols")
+    extractor = FinancialDataExtractor(
+        rate_limiter=RateLimiter(per_second=RATE_LIMIT_PER_SECOND / rate_share,
+                                 per_minute=RATE_LIMIT_PER_MINUTE / rate_share),
+        checkpoint_path=_shard_checkpoint_path(index, count),
+        metrics=Metrics({"shard": f"{index}/{count}"}),
+        max_companies=math.ceil(MAX_COMPANIES / count))
+    if resume and not extractor.load_checkpoint():
+        logger.warning(f"No checkpoint found for shard {index}/{count}; starting fresh.")
+    extractor.set_deadline(extraction_deadline(deadline))
+
+    started = time.perf_counter()
+    complete = True
+    try:
+        run_extraction(extractor, symbols, mode, bulk_dir)
+    except Exception as e:
+        logger.error(f"Shard {index}/{count} stopped early: {e}", exc_info=True)
+        complete = False
+    finally:
+        extractor.close()
+
+    path = shard_partial_path(index, count)
+    try:
+        extractor.write_partial(path)
+    except Exception as e:
+        logger.error(f"Writing shard partial {path} failed: {e}", exc_info=True)
+        path = None
+    else:
+        if complete and not extractor.skipped_symbols:
+            extractor.clear_checkpoint()
+        else:
+            logger.info(f"Checkpoint kept for shard {index}/{count}; run again with --resume to finish it.")
+    extractor.report_run(time.perf_counter() - started, _shard_metrics_path(index, count))
+    return path
+
+
+def run_workers(workers, mode="api", bulk_dir=None, resume=False, deadline=None):
+    """
+    Runs `workers` shards in parallel processes on this machine, splitting
+    the API rate limit between them. Returns the partials that were written.
+    """
+    context = multiprocessing.get_context("spawn")  # No inherited locks or sessions
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(run_shard, index, workers, mode, bulk_dir, resume, workers, deadline)
+                   for index in range(workers)]
+        paths = []
+        for index, future in enumerate(futures):
+            try:
+                path = future.result()
+            except Exception as e:
+                logger.error(f"Shard {index}/{workers} failed: {e}")
+                continue
+            if path:
+                paths.append(path)
+    return paths
+
+
+def merge_partials(paths, outputs):
+    """
+    Merges shard partials into the final outputs. A company found in more than
+    one partial, e.g. after re-sharding or re-running a shard elsewhere, is
+    taken from the newest partial only; rows then go through the normal
+    export dedup and sort.
+    """
+    if not paths:
+        logger.error("No shard partials to merge.")
+        return False
+    merged = FinancialDataExtractor(cache=False, checkpoint_path=None)
+    seen = set()
+    try:
+        for path in sorted(paths, key=os.path.getmtime, reverse=True):
+            frame = pd.read_feather(path)
+            companies = frame["companyname"].astype(object)
+            frame = frame[~companies.isin(seen)]
+            seen.update(companies.dropna().unique())
+            merged.data.extend_frame(frame)
+            logger.info(f"Merged {len(frame)} rows from {path}")
+        return merged.export(outputs)
+    finally:
+        merged.close()
+
+
+def _partial_paths(value):
+    """Expands --merge: a directory of partials, or a comma-separated list of files."""
+    if os.path.isdir(value):
+        return sorted(glob.glob(os.path.join(value, "*.feather")))
+    return [path.strip() for path in value.split(",") if path.strip()]
+
+
+def _duration(value):
+    """argparse type for --deadline: seconds, or a number ending in s, m or h."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    text = value.strip().lower()
+    scale = units.get(text[-1:], None)
+    try:
+        seconds = float(text[:-1] if scale else text) * (scale or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a duration such as 900, 45m or 2h (got {value!r})")
+    if seconds <= 0:
+        raise argparse.ArgumentTypeError(f"deadline must be positive (got {value!r})")
+    return seconds
+
+
+def _shard_spec(value):
+    """argparse type for --shard: 'i/N' with 0 <= i < N."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT such as 0/4 (got {value!r})")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be in 0..COUNT-1 (got {value!r})")
+    return index, count
+
+
+def _output_formats(value):
+    """argparse type for --format: a comma-separated list of export formats."""
+    formats = [item.strip().lower() for item in value.split(",") if item.strip()]
+    unknown = [item for item in formats if item not in EXPORT_WRITERS]
+    if not formats or unknown:
+        raise argparse.ArgumentTypeError(
+            f"choose from {', '.join(EXPORT_WRITERS)} (got {value!r})")
+    return formats
+
+
+def parse_args(argv=None):
+    """Command-line options for main()."""
+    parser = argparse.ArgumentParser(
+        description="Extract company revenue data from Financial Modeling Prep.")
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="continue from the last checkpoint, skipping symbols already processed")
+    parser.add_argument(
+        "--mode", choices=("api", "bulk"), default="api",
+        help="'api' fetches one income statement per symbol; 'bulk' downloads "
+             "the annual bulk files once per fiscal year")
+    parser.add_argument(
+        "--bulk-dir",
+        help="read income-statement-bulk-<year>.csv files from this directory instead of FMP")
+    parser.add_argument(
+        "--format", dest="formats", type=_output_formats, default=["xlsx"],
+        help=f"comma-separated output formats: {', '.join(EXPORT_WRITERS)} (default: xlsx)")
+    sharding = parser.add_mutually_exclusive_group()
+    sharding.add_argument(
+        "--shard", type=_shard_spec, metavar="INDEX/COUNT",
+        help="extract only this shard of the symbols (e.g. 0/4) and write a partial "
+             f"to {SHARD_DIR}/ for a later --merge; one per process or machine")
+    sharding.add_argument(
+        "--workers", type=int, default=1,
+        help="run this many shards in parallel processes, then merge them")
+    sharding.add_argument(
+        "--merge", metavar="PATH",
+        help="merge shard partials (a directory or comma-separated files) into the outputs")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="read the previous output and only fetch companies missing expected fiscal years")
+    parser.add_argument(
+        "--deadline", type=_duration,
+        help="time budget for the whole run (e.g. 900, 45m, 2h): outstanding work is skipped "
+             "when it runs out and whatever is complete is exported")
+    args = parser.parse_args(argv)
+    if args.incremental and (args.shard or args.workers > 1 or args.merge):
+        parser.error("--incremental can't be combined with --shard, --workers or --merge")
+    return args
+
+
+def main(argv=None):
     """
     Main execution flow:
     Loads symbols, fetches data, and exports it.
     """
+    args = parse_args(argv)
+    outputs = {fmt: OUTPUT_FILES[fmt] for fmt in args.formats}
+    if args.merge:
+        if not merge_partials(_partial_paths(args.merge), outputs):
+            logger.error("Merging shard partials failed.")
+        return
+    if args.shard:
+        index, count = args.shard
+        run_shard(index, count, args.mode, args.bulk_dir, args.resume, deadline=args.deadline)
+        return
+    if args.workers > 1:
+        logger.info(f"Starting sharded extraction with {args.workers} worker processes")
+        paths = run_workers(args.workers, args.mode, args.bulk_dir, args.resume, args.deadline)
+        if len(paths) < args.workers:
+            logger.warning(f"Only {len(paths)} of {args.workers} shards finished; "
+                           "rerun the missing ones with --shard and --merge again.")
+        if not merge_partials(paths, outputs):
+            logger.error("Merging shard partials failed.")
+        return
+
     logger.info("Starting financial data extraction")
     extractor = FinancialDataExtractor()
+    extractor.set_deadline(extraction_deadline(args.deadline))
+    if args.resume and not extractor.load_checkpoint():
+        logger.warning("No checkpoint found; starting a fresh run.")
     symbols = load_company_symbols()
 
     if not symbols:
         logger.error("No company symbols found.")
         return
 
-    extractor.extract_all_companies(symbols)
+    previous = None
+    if args.incremental:
+        target, previous = read_previous_output(outputs)
+        if previous is None:
+            logger.warning("No previous output found; running a full extraction.")
+        else:
+            logger.info(f"Refreshing {len(previous)} rows from {target}")
+
+    started = time.perf_counter()
+    complete = True
+    try:
+        if previous is not None:
+            symbols = extractor.plan_refresh(symbols, previous)
+        run_extraction(extractor, symbols, args.mode, args.bulk_dir)
+    except Exception as e:
+        # Export whatever was collected rather than leaving no output at all
+        logger.error(f"Extraction stopped early: {e}", exc_info=True)
+        complete = False
+    finally:
+        extractor.close()
 
-    if not extractor.export_to_excel():
+    if previous is not None:
+        extractor.merge_previous(previous)
+    if not extractor.export(outputs, incremental=previous is not None):
         logger.error("Data export failed.")
     else:
+        if complete and not extractor.skipped_symbols:
+            extractor.clear_checkpoint()
+        else:
+            logger.info("Checkpoint kept; run again with --resume to finish the remaining symbols.")
         logger.info("Data export completed successfully.")
+    extractor.report_run(time.perf_counter() - started)
 
 
 if __name__ == "__main__":
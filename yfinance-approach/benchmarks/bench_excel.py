@@ -0,0 +1,111 @@
+"""
+Timing comparison for the yfinance script's Excel export.
+
+Compares the previous export (pandas ExcelWriter, then a loop over
+worksheet.iter_rows setting number_format on every revenue cell) with
+write_excel. Each exporter runs in a child process; the parent reads the
+child's peak RSS when it exits and checks that both files hold the same cells.
+
+Usage:
+    python benchmarks/bench_excel.py --rows 300000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "source_yfinance"))
+
+EXPORTERS = ("loop", "write_excel")
+
+
+def build_frame(rows):
+    """Synthetic rows shaped like get_financial_data's output, data_source already dropped"""
+    import pandas as pd
+
+    return pd.DataFrame({
+        "timevalue": [str(2024 - i % 5) for i in range(rows)],
+        "companyname": [f"Company {i // 5:06d} Inc." for i in range(rows)],
+        "industryclassification": [f"Industry {i % 97}" for i in range(rows)],
+        "geonameen": [("United States", "Canada", "Germany", "Japan")[i % 4] for i in range(rows)],
+        "revenue": [1_000_000_000 + i * 7919 for i in range(rows)],
+        "revenue_unit": ["USD"] * rows
+    })
+
+
+def export_with_loop(df, filename):
+    """The export as __main__ did it before write_excel"""
+    import pandas as pd
+
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False)
+        worksheet = writer.sheets['Sheet1']
+        for row in worksheet.iter_rows(min_row=2, max_row=len(df)+1, min_col=5, max_col=5):
+            for cell in row:
+                cell.number_format = '0'
+
+
+def fingerprint(filename):
+    """Hash of every cell value and number format, read back in read-only mode"""
+    from openpyxl import load_workbook
+
+    digest = 0
+    for row in load_workbook(filename, read_only=True).active.iter_rows():
+        digest = hash((digest, tuple((cell.value, cell.number_format) for cell in row)))
+    return digest
+
+
+def run_child(exporter, rows):
+    """Runs one exporter and prints its time, file size and output fingerprint"""
+    from case_study_financialData import write_excel
+
+    df = build_frame(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "export.xlsx")
+        start = time.perf_counter()
+        if exporter == "loop":
+            export_with_loop(df, filename)
+        else:
+            write_excel(df, filename)
+        elapsed = time.perf_counter() - start
+        print(elapsed, os.path.getsize(filename) / 2**20, fingerprint(filename))
+
+
+def measure(exporter, rows):
+    """Runs `exporter` in a child process. Returns (seconds, file MB, fingerprint, peak RSS MB)"""
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--rows", str(rows),
+                              "--child", exporter], stdout=subprocess.PIPE, text=True,
+                             env=dict(os.environ, PYTHONHASHSEED="0"))
+    output = child.stdout.read()
+    _, status, usage = os.wait4(child.pid, 0)
+    child.returncode = os.waitstatus_to_exitcode(status)
+    if child.returncode:
+        raise SystemExit(f"{exporter} failed with exit code {child.returncode}")
+    elapsed, size_mb, digest = output.split()
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak_mb = usage.ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    return float(elapsed), float(size_mb), digest, peak_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the yfinance Excel exporters.")
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--child", choices=EXPORTERS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.rows)
+        return
+    digests = set()
+    for exporter in EXPORTERS:
+        elapsed, size_mb, digest, peak_mb = measure(exporter, args.rows)
+        digests.add(digest)
+        print(f"{exporter:<12} rows={args.rows:<8} time={elapsed:7.2f}s  "
+              f"peak_rss={peak_mb:7.1f}MB  file={size_mb:.1f}MB")
+    print("outputs match" if len(digests) == 1 else "OUTPUTS DIFFER")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,264 @@
 import pandas as pd
 import yfinance as yf
 from tqdm import tqdm
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+import os
+import json
 import time
+import re
 import sys
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 # === CONFIGURATION ===
 OUTPUT_FILE = 'company_financials.xlsx'
+REVENUE_FORMAT = '0'  # Excel format of the revenue column: plain numbers
 YEARS = [2024, 2023, 2022, 2021, 2020]  # Most recent 5 years
 CURRENT_YEAR = 2024
+MAX_WORKERS = 8  # Tickers fetched in parallel (1 = serial)
+THROTTLE_START_RATE = 2.0  # Ticker starts per second, shared by all workers
+THROTTLE_MIN_RATE = 0.1
+THROTTLE_MAX_RATE = 20.0
+THROTTLE_RATE_STEP = 0.5  # Rate gained per second while Yahoo answers
+THROTTLE_BACKOFF = 0.5  # Rate multiplier when Yahoo throttles
+THROTTLE_COOLDOWN = 2.0  # Seconds after a cut in which newly started tickers cannot cut again
+THROTTLE_REQUEUES = 3  # Extra passes over tickers that were throttled
+THROTTLE_PATTERN = re.compile(r'429|too many requests|rate limit', re.IGNORECASE)
+REVENUE_LABELS = ('Total Revenue', 'Operating Revenue', 'Revenue')  # Statement rows tried in order
+CACHE_ENABLED = True
+CACHE_DIR = 'yfinance_cache'  # One folder per ticker
+CACHE_TTL = 7 * 24 * 3600  # Seconds before a cached payload is fetched again
+OFFLINE = os.getenv('YF_OFFLINE', '').lower() in ('1', 'true', 'yes')  # Replay from the cache only
+
+
+class AdaptiveThrottle:
+    """
+    Spaces out ticker starts across all workers (AIMD): the rate grows by about `step`
+    per second while Yahoo answers and is cut multiplicatively when it throttles
+    """
+
+    def __init__(self, rate=THROTTLE_START_RATE, min_rate=THROTTLE_MIN_RATE, max_rate=THROTTLE_MAX_RATE,
+                 step=THROTTLE_RATE_STEP, backoff=THROTTLE_BACKOFF, cooldown=THROTTLE_COOLDOWN):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.peak_rate = rate
+        self.throttled_count = 0
+        self.cuts = 0
+        self._last_cut = float('-inf')
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Blocks until this caller's turn to start a ticker; returns the start time"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / self.rate
+        if slot > now:
+            time.sleep(slot - now)
+        return slot
+
+    def success(self):
+        with self._lock:
+            # step / rate per ticker adds up to `step` per second at any rate
+            self.rate = min(self.max_rate, self.rate + self.step / self.rate)
+            self.peak_rate = max(self.peak_rate, self.rate)
+
+    def throttled(self, started=None):
+        """
+        Cuts the rate. Tickers started before the previous cut, or within `cooldown` of it,
+        hit Yahoo's limit window while it was still full: they are counted but do not cut again
+        """
+        with self._lock:
+            self.throttled_count += 1
+            if started is not None and started < self._last_cut + self.cooldown:
+                return
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            self._last_cut = time.monotonic()
+            self.cuts += 1
+
+    def summary(self):
+        return {
+            'rate': round(self.rate, 2),
+            'peak_rate': round(self.peak_rate, 2),
+            'throttled': self.throttled_count,
+            'cuts': self.cuts
+        }
+
+
+class TickerCache:
+    """
+    Local copy of Yahoo payloads: statement frames are pickled, info is stored as JSON.
+    Entries older than `ttl` seconds are fetched again; in offline mode nothing is
+    fetched and entries of any age are replayed
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, offline=OFFLINE):
+        self.directory = directory
+        self.ttl = ttl
+        self.offline = offline
+
+    def _path(self, ticker, source):
+        extension = 'json' if source == 'info' else 'pkl'
+        return os.path.join(self.directory, ticker, f"{source}.{extension}")
+
+    def load(self, ticker, source):
+        """Returns (found, value)"""
+        path = self._path(ticker, source)
+        try:
+            age = time.time() - os.path.getmtime(path)
+        except OSError:
+            return False, None
+        if not self.offline and age > self.ttl:
+            return False, None
+        try:
+            if source == 'info':
+                with open(path, encoding='utf-8') as f:
+                    return True, json.load(f)
+            return True, pd.read_pickle(path)
+        except Exception as e:
+            print(f"Ignoring unreadable cache entry {path}: {str(e)}")
+            return False, None
+
+    def store(self, ticker, source, value):
+        # Empty answers are not kept: Yahoo often returns them while throttling
+        if value is None or len(value) == 0:
+            return
+        path = self._path(ticker, source)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        if source == 'info':
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, default=str)
+        else:
+            value.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+    def missing(self, ticker, source):
+        """Offline stand-in for an uncached source: no statement data, and an error for info"""
+        if source == 'info':
+            raise LookupError(f"info for {ticker} is not cached (offline mode)")
+        return None
+
+
+class LazyTickerData:
+    """
+    Fetches a Ticker's info, financials and quarterly_financials on first use only,
+    recording which of them were touched. Sources come from `cache` when it has them;
+    the shared throttle is only waited on before the ticker's first Yahoo call
+    """
+
+    def __init__(self, ticker, cache=None, throttle=None):
+        self.ticker = ticker
+        self.cache = cache
+        self.throttle = throttle
+        self.company = None
+        self.touched = []  # Sources needed, in the order they were first needed
+        self.downloaded = []  # The touched sources that came from Yahoo rather than the cache
+        self.empty = []  # The downloaded sources Yahoo answered with nothing
+        self.started = None  # Throttle slot of the first Yahoo call
+        self.throttled = False
+        self._values = {}
+
+    def get(self, source):
+        if source not in self._values:
+            self.touched.append(source)
+            self._values[source] = self._load(source)
+        return self._values[source]
+
+    def _load(self, source):
+        if self.cache is not None:
+            found, value = self.cache.load(self.ticker, source)
+            if found:
+                return value
+            if self.cache.offline:
+                return self.cache.missing(self.ticker, source)
+        if self.company is None:
+            if self.throttle is not None:
+                self.started = self.throttle.wait()
+            self.company = safe_yfinance_call(self.ticker)
+            if not self.company:
+                raise LookupError(f"could not create a Ticker for {self.ticker}")
+        value = getattr(self.company, source)
+        self.downloaded.append(source)
+        if value is None or len(value) == 0:
+            self.empty.append(source)
+        if self.cache is not None:
+            self.cache.store(self.ticker, source, value)
+        return value
+
+    @property
+    def info(self):
+        return self.get('info')
+
+    @property
+    def financials(self):
+        return self.get('financials')  # Annual financials
+
+    @property
+    def quarterly(self):
+        return self.get('quarterly_financials')  # Quarterly financials
+
+
+def column_year(col):
+    """Fiscal year of a statement column (a Timestamp, or a label containing the year)"""
+    year = getattr(col, 'year', None)
+    if year is None:
+        match = re.search(r'(?:19|20)\d{2}', str(col))
+        year = int(match.group()) if match else None
+    return year
+
+def revenue_row(frame):
+    """The revenue line of a yfinance statement frame, picked by label, or None"""
+    if frame is None or frame.empty:
+        return None
+    for label in REVENUE_LABELS:
+        if label in frame.index:
+            row = frame.loc[label]
+            return row.iloc[0] if isinstance(row, pd.DataFrame) else row
+    return None
+
+def annual_revenue_by_year(financials):
+    """
+    Resolves annual revenue for every year in YEARS in one pass: a year maps to
+    the first column of that year, and years whose value is missing are left out
+    """
+    row = revenue_row(financials)
+    if row is None:
+        return {}
+    years = pd.Index([column_year(col) for col in row.index])
+    values = pd.to_numeric(row, errors='coerce').to_numpy()
+    keep = years.isin(YEARS) & ~years.duplicated() & pd.notna(values)
+    return dict(zip(years[keep], values[keep]))
+
+def quarterly_revenue(quarterly, year):
+    """Sum of the revenue line over the quarters of `year`, or None"""
+    row = revenue_row(quarterly)
+    if row is None:
+        return None
+    in_year = [column_year(col) == year for col in row.index]
+    total = pd.to_numeric(row[in_year], errors='coerce').sum(min_count=1)
+    return None if pd.isna(total) else total
+
+def info_revenue_by_year(info):
+    """Index of info keys that name both 'revenue' and one of YEARS, first key per year"""
+    index = {}
+    for k, v in info.items():
+        key = str(k).lower()
+        if 'revenue' not in key:
+            continue
+        for year in YEARS:
+            if str(year) in key:
+                index.setdefault(year, v)
+    return index
+
 
 def safe_yfinance_call(ticker):
     """Wrapper with error handling for yfinance"""
@@ -19,86 +268,178 @@ def safe_yfinance_call(ticker):
         print(f"Error fetching {ticker}: {str(e)}")
         return None
 
-def get_financial_data(ticker_map):
-    """Attempts multiple methods to extract revenue for a specific year"""
-    results = []
+def extract_ticker_rows(ticker, company_name, data=None):
+    """
+    Attempts multiple methods to extract revenue for each year of one ticker.
+    Each source is only fetched once a method needs it: quarterly data only when the
+    annual column for CURRENT_YEAR is missing, info only for row metadata or as the
+    last fallback. Returns (rows, sources touched).
+    """
+    rows = []
+    data = data or LazyTickerData(ticker)
+    annual = annual_revenue_by_year(data.financials)
+    info_revenue = None  # Built from info on first use
     
-    for ticker, company_name in tqdm(ticker_map.items(), desc="Processing Companies"):
-        try:
-            company = safe_yfinance_call(ticker)
-            if not company:
-                continue
-                
-            info = company.info
-            financials = company.financials  # Annual financials
-            quarterly = company.quarterly_financials  # Quarterly financials
-            
-            for year in YEARS:
-                revenue = None
-                revenue_source = None  
-                
-                # Method 1:  Annual Financials
-                if financials is not None and not financials.empty:
-                    for col in financials.columns:
-                        if str(year) in str(col):
-                            if not financials[col].empty:
-                                revenue = financials[col].iloc[0]
-                                revenue_source = "annual report"
-                            break
-                
-                # Method 2:  Quarterly Sum (only for current year)
-                if revenue is None and year == CURRENT_YEAR and quarterly is not None:
-                    current_year_cols = [col for col in quarterly.columns if str(year) in str(col)]
-                    if current_year_cols:
-                        revenue = quarterly[current_year_cols].sum().sum()
-                        revenue_source = "quarterly reports"
-                
-                # Method 3: Fallback to info dictionary
-                if revenue is None:
-                    if year == CURRENT_YEAR and 'totalRevenue' in info:
-                        revenue = info['totalRevenue']
-                        revenue_source = "company info"
-                    elif f'revenue{year}' in str(info).lower():
-                        for k, v in info.items():
-                            if str(year) in str(k) and 'revenue' in str(k).lower():
-                                revenue = v
-                                revenue_source = "company info"
-                                break
+    for year in YEARS:
+        revenue = None
+        revenue_source = None  
+        
+        # Method 1:  Annual Financials
+        if year in annual:
+            revenue = annual[year]
+            revenue_source = "annual report"
+        
+        # Method 2:  Quarterly Sum (only for current year)
+        if revenue is None and year == CURRENT_YEAR:
+            revenue = quarterly_revenue(data.quarterly, year)
+            if revenue is not None:
+                revenue_source = "quarterly reports"
+        
+        # Method 3: Fallback to info dictionary
+        if revenue is None:
+            info = data.info
+            if year == CURRENT_YEAR and 'totalRevenue' in info:
+                revenue = info['totalRevenue']
+                revenue_source = "company info"
+            else:
+                if info_revenue is None:
+                    info_revenue = info_revenue_by_year(info)
+                if year in info_revenue:
+                    revenue = info_revenue[year]
+                    revenue_source = "company info"
+        
+        if revenue is not None:
+            """Ensures revenue is a valid positive integer"""
+            try:
+                # Convert to integer
+                revenue_int = int(float(revenue))
                 
-                if revenue is not None:
-                    """Ensures revenue is a valid positive integer"""
-                    try:
-                        # Convert to integer
-                        revenue_int = int(float(revenue))
-                        
-                        # Revenue validation
-                        if revenue_int < 0:
-                            print(f"Warning: Negative revenue ({revenue_int}) for {company_name} ({year}) from {revenue_source} - treating as unavailable")
-                            continue
-                        elif revenue_int == 0:
-                            print(f"Warning: Zero revenue for {company_name} ({year}) from {revenue_source} - treating as unavailable")
-                            continue
-                            
-                        results.append({
-                            'timevalue': str(year),
-                            'companyname': company_name,
-                            'industryclassification': info.get('industry', info.get('sector', 'N/A')),
-                            'geonameen': info.get('country', 'N/A'),
-                            'revenue': revenue_int, 
-                            'revenue_unit': info.get('currency', 'USD'),
-                            'data_source': revenue_source  
-                        })
-                    except (ValueError, TypeError) as e:
-                        print(f"Error converting revenue for {company_name} ({year}): {str(e)}")
-                        continue
-            
-            time.sleep(0.5)  
-            
-        except Exception as e:
+                # Revenue validation
+                if revenue_int < 0:
+                    print(f"Warning: Negative revenue ({revenue_int}) for {company_name} ({year}) from {revenue_source} - treating as unavailable")
+                    continue
+                elif revenue_int == 0:
+                    print(f"Warning: Zero revenue for {company_name} ({year}) from {revenue_source} - treating as unavailable")
+                    continue
+                    
+                info = data.info
+                rows.append({
+                    'timevalue': str(year),
+                    'companyname': company_name,
+                    'industryclassification': info.get('industry', info.get('sector', 'N/A')),
+                    'geonameen': info.get('country', 'N/A'),
+                    'revenue': revenue_int, 
+                    'revenue_unit': info.get('currency', 'USD'),
+                    'data_source': revenue_source  
+                })
+            except (ValueError, TypeError) as e:
+                print(f"Error converting revenue for {company_name} ({year}): {str(e)}")
+                continue
+    
+    return rows, data.touched
+
+def process_ticker(ticker, company_name, throttle, cache=None, attempt=0):
+    """
+    Runs one ticker and returns (rows, LazyTickerData). Yahoo calls go through the
+    shared throttle, which only hears about tickers that reached Yahoo. A rate-limit
+    error or an empty info answer marks the ticker as throttled so it can be re-queued;
+    other errors are reported and yield no rows. An empty info only cuts the rate on
+    the ticker's first pass, and on the last pass its rows are kept as they are
+    """
+    data = LazyTickerData(ticker, cache, throttle)
+    try:
+        rows, _ = extract_ticker_rows(ticker, company_name, data)
+    except Exception as e:
+        if data.company is not None and THROTTLE_PATTERN.search(str(e)):
+            data.throttled = True
+            throttle.throttled(data.started)
+        else:
             print(f"Error processing {ticker}: {str(e)}")
-            continue
+        return [], data
+    if 'info' in data.empty and attempt < THROTTLE_REQUEUES:
+        data.throttled = True
+        if attempt == 0:
+            throttle.throttled(data.started)
+        return [], data
+    if data.downloaded:
+        throttle.success()
+    return rows, data
+
+def get_financial_data(ticker_map, max_workers=MAX_WORKERS, cache=None):
+    """
+    Collects revenue rows for every ticker in ticker_map.
+    With max_workers > 1 tickers are fetched on a thread pool; rows keep the
+    ticker_map order either way. df.attrs['sources_touched'] maps each ticker
+    to the lookups it needed and df.attrs['sources_downloaded'] to those that
+    were not served by the cache. Pass cache=False to bypass the disk cache.
+    Throttled tickers are re-queued for up to THROTTLE_REQUEUES more passes;
+    df.attrs['throttle'] reports the rate reached and how often Yahoo pushed back.
+    """
+    if cache is None and (CACHE_ENABLED or OFFLINE):
+        cache = TickerCache()
+    cache = cache or None
+    if cache is not None and cache.offline:
+        print(f"Offline mode: replaying cached Yahoo data from {cache.directory}")
+    throttle = AdaptiveThrottle()
+    items = list(ticker_map.items())
+    results_by_ticker = [None] * len(items)
+    pending = list(range(len(items)))
+    requeued = 0
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    try:
+        for attempt in range(THROTTLE_REQUEUES + 1):
+            desc = "Processing Companies" if attempt == 0 else f"Retrying throttled (pass {attempt + 1})"
+            if executor is None:
+                for i in tqdm(pending, desc=desc):
+                    results_by_ticker[i] = process_ticker(*items[i], throttle, cache, attempt)
+            else:
+                futures = {executor.submit(process_ticker, *items[i], throttle, cache, attempt): i
+                           for i in pending}
+                for future in tqdm(as_completed(futures), total=len(futures), desc=desc):
+                    results_by_ticker[futures[future]] = future.result()
+            
+            pending = [i for i in pending if results_by_ticker[i][1].throttled]
+            if not pending or attempt == THROTTLE_REQUEUES:
+                break
+            requeued += len(pending)
+            print(f"Yahoo throttled {len(pending)} tickers; re-queueing them at {throttle.rate:.2f} tickers/s")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if pending:
+        print(f"Gave up on {len(pending)} tickers still throttled: {', '.join(items[i][0] for i in pending)}")
+    
+    df = pd.DataFrame([row for rows, _ in results_by_ticker for row in rows])
+    df.attrs['sources_touched'] = {
+        ticker: data.touched for (ticker, _), (_, data) in zip(items, results_by_ticker)
+    }
+    df.attrs['sources_downloaded'] = {
+        ticker: data.downloaded for (ticker, _), (_, data) in zip(items, results_by_ticker)
+    }
+    df.attrs['throttle'] = dict(throttle.summary(), requeued=requeued, dropped=len(pending))
+    return df
+
+def write_excel(df, filename=OUTPUT_FILE):
+    """
+    Saves df as a single sheet with the revenue column in REVENUE_FORMAT. The
+    workbook is write-only, so each row goes to disk as it is added and its revenue
+    cell is created with the format already set; no second pass over the sheet
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(list(df.columns))
+    revenue_col = df.columns.get_loc('revenue') if 'revenue' in df.columns else None
     
-    return pd.DataFrame(results)
+    for values in df.itertuples(index=False, name=None):
+        if revenue_col is not None:
+            values = list(values)
+            revenue = WriteOnlyCell(sheet, value=values[revenue_col])
+            revenue.number_format = REVENUE_FORMAT
+            values[revenue_col] = revenue
+        sheet.append(values)
+    
+    workbook.save(filename)
 
 # ticker map [Selected 500 companies]
 ticker_map = {
@@ -614,19 +955,24 @@ if __name__ == "__main__":
     # Remove the debug column if needed
         df = df.drop(columns=['data_source'])
     
-    # Save to Excel with desired formatting
-        with pd.ExcelWriter(OUTPUT_FILE, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False)
-        
-        # Format revenue column as plain numbers
-            worksheet = writer.sheets['Sheet1']
-            for row in worksheet.iter_rows(min_row=2, max_row=len(df)+1, min_col=5, max_col=5):
-                for cell in row:
-                    cell.number_format = '0'  
+    # Save to Excel, revenue formatted as plain numbers
+        write_excel(df, OUTPUT_FILE)
         
         print(f"\nSuccess! Collected data for {len(df['companyname'].unique())} companies")
         print(f"Saved to {OUTPUT_FILE}")
         
+        lookups = {}
+        for touched in df.attrs.get('sources_touched', {}).values():
+            for source in touched:
+                lookups[source] = lookups.get(source, 0) + 1
+        downloads = sum(len(d) for d in df.attrs.get('sources_downloaded', {}).values())
+        print(f"Yahoo lookups: {lookups} ({sum(lookups.values()) - downloads} served from cache)")
+        
+        throttle = df.attrs.get('throttle', {})
+        print(f"Throttle: ended at {throttle.get('rate')} tickers/s (peak {throttle.get('peak_rate')}), "
+              f"{throttle.get('throttled')} throttled answers, {throttle.get('requeued')} tickers re-queued, "
+              f"{throttle.get('dropped')} dropped")
+        
         print("\nSample data:")
         print(df.head())
     else: